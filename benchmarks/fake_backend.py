@@ -0,0 +1,199 @@
+"""Local stand-in for the Gemini text and Imagen endpoints.
+
+Implements the slice of google-genai's Client that studio uses
+(models.generate_content / generate_content_stream / generate_images / list
+and caches.create / delete) with configurable latency, injected 429s and
+image payload sizes, so benchmarks never spend quota:
+
+    backend = FakeBackend(text_latency=Latency.parse("lognormal:800:0.4"), error_rate=0.05)
+    registry = ClientRegistry(client_factory=backend.client)
+
+Latency specs are "fixed:MS", "uniform:LOW_MS:HIGH_MS" or
+"lognormal:MEDIAN_MS:SIGMA".
+"""
+import io
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from PIL import Image
+
+BATCH_CLIP = re.compile(r'CLIP #(\d+): "')
+SINGLE_CLIP = re.compile(r"CLIP #(\d+)")
+
+PROMPT_TEXT = (
+    "Medium close-up, eye level. The character from the reference delivers the line with a "
+    "confident half-smile, eyebrows lifting on the key word. Soft key light from camera left, "
+    "warm rim light, shallow depth of field, slow push-in over four seconds. {quote}"
+)
+
+
+class Latency:
+    """A latency distribution; sample() returns seconds"""
+
+    KINDS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, kind="fixed", a=0.0, b=0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown latency kind '{kind}' (expected one of {', '.join(self.KINDS)})")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec):
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params] + [0.0, 0.0]
+        return cls(kind, values[0], values[1])
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            ms = self.a
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.a, self.b)
+        else:
+            ms = rng.lognormvariate(0.0, self.b) * self.a
+        return max(0.0, ms) / 1000
+
+    def __str__(self):
+        return ":".join([self.kind, f"{self.a:g}"] + ([f"{self.b:g}"] if self.kind != "fixed" else []))
+
+
+class RateLimited(Exception):
+    """Shaped like the SDK's 429 error, including the server's retry hint"""
+
+    def __init__(self, retry_after):
+        super().__init__(
+            f"429 RESOURCE_EXHAUSTED. Resource has been exhausted (e.g. check quota). "
+            f"Please retry in {retry_after:.3f}s."
+        )
+
+
+def fake_image(size, fmt="PNG"):
+    """Encoded test image with noise, so encoders do realistic work"""
+    noise = Image.effect_noise((size, size), 64)
+    gradient = Image.linear_gradient("L").resize((size, size))
+    img = Image.merge("RGB", (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class FakeBackend:
+    """Shared state for every fake client: latency, errors, payloads and counters"""
+
+    def __init__(self, text_latency=None, image_latency=None, error_rate=0.0, retry_after=0.05,
+                 image_size=1024, seed=0):
+        self.text_latency = text_latency or Latency("fixed", 0)
+        self.image_latency = image_latency or Latency("fixed", 0)
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.image_size = image_size
+        self.rng = random.Random(seed)
+        self.counts = {"text": 0, "stream": 0, "image": 0, "cache": 0, "rate_limited": 0}
+        self._image = None
+        self._lock = threading.Lock()
+
+    def client(self, api_key=None):
+        """Drop-in for google.genai.Client(api_key=...)"""
+        return FakeClient(self)
+
+    def image_bytes(self):
+        with self._lock:
+            if self._image is None:
+                self._image = fake_image(self.image_size)
+            return self._image
+
+    def call(self, kind, latency):
+        """Sleep for one sampled latency, then maybe fail with a 429"""
+        with self._lock:
+            self.counts[kind] += 1
+            delay = latency.sample(self.rng)
+            limited = self.rng.random() < self.error_rate
+            if limited:
+                self.counts["rate_limited"] += 1
+        time.sleep(delay)
+        if limited:
+            raise RateLimited(self.retry_after)
+
+    def reset(self):
+        with self._lock:
+            for kind in self.counts:
+                self.counts[kind] = 0
+
+
+def usage(contents, text):
+    prompt = contents if isinstance(contents, str) else " ".join(c for c in contents if isinstance(c, str))
+    return SimpleNamespace(
+        prompt_token_count=len(prompt) // 4 + 1 + (0 if isinstance(contents, str) else 258),
+        candidates_token_count=len(text) // 4 + 1,
+        cached_content_token_count=None,
+    )
+
+
+def respond(contents, config):
+    """Plausible text for a request: JSON clip entries for structured batches, prose otherwise"""
+    prompt = contents if isinstance(contents, str) else contents[0]
+    if config is not None and getattr(config, "response_mime_type", None) == "application/json":
+        return json.dumps([
+            {"clip": int(n), "prompt": PROMPT_TEXT.format(quote=f"(clip {n})")}
+            for n in BATCH_CLIP.findall(prompt)
+        ])
+    match = SINGLE_CLIP.search(prompt)
+    return PROMPT_TEXT.format(quote=f"(clip {match.group(1)})" if match else "")
+
+
+class FakeModels:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def list(self):
+        return [SimpleNamespace(name="models/gemini-3-flash-preview"),
+                SimpleNamespace(name="models/imagen-4.0-generate-001")]
+
+    def generate_content(self, model, contents, config=None):
+        self.backend.call("text", self.backend.text_latency)
+        text = respond(contents, config)
+        return SimpleNamespace(text=text, usage_metadata=usage(contents, text))
+
+    def generate_content_stream(self, model, contents, config=None):
+        # The whole latency goes before the first chunk, as with a real time-to-first-token
+        self.backend.call("stream", self.backend.text_latency)
+        text = respond(contents, config)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield SimpleNamespace(text=word + ("" if last else " "),
+                                  usage_metadata=usage(contents, text) if last else None)
+
+    def generate_images(self, model, prompt, config):
+        self.backend.call("image", self.backend.image_latency)
+        data = self.backend.image_bytes()
+        return SimpleNamespace(generated_images=[
+            SimpleNamespace(image=SimpleNamespace(image_bytes=data, mime_type="image/png"))
+            for _ in range(config.number_of_images)
+        ])
+
+
+class FakeCaches:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, model, config):
+        self.backend.call("cache", self.backend.text_latency)
+        return SimpleNamespace(name=f"cachedContents/fake-{self.backend.counts['cache']}")
+
+    def update(self, name, config):
+        pass
+
+    def delete(self, name):
+        pass
+
+
+class FakeClient:
+    def __init__(self, backend):
+        self.models = FakeModels(backend)
+        self.caches = FakeCaches(backend)
@@ -0,0 +1,85 @@
+"""Cold-start benchmark for Ultra Studio.
+
+Reports the cold import time of each heavy dependency (each in a fresh
+interpreter, via ``python -X importtime``) and the time to render the login
+page from a cold process, along with which heavy modules that first run
+pulled in. Run from the repo root:
+
+    python benchmarks/startup.py [--output startup.json] [--budget-ms 1500]
+
+Exits non-zero if the login page exceeds --budget-ms or imports a module that
+main.py is supposed to load lazily, so regressions show up in CI.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ["streamlit", "google.genai", "google.genai.types", "PIL.Image"]
+LAZY_MODULES = ["google.genai", "google.genai.types", "PIL.Image"]
+
+LOGIN_PAGE_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({path!r}, default_timeout=60)
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "login_page_ms": elapsed * 1000,
+    "loaded": [m for m in {lazy!r} if m in sys.modules],
+    "exception": [e.message for e in at.exception],
+}}))
+"""
+
+
+def import_time_ms(module):
+    """Cumulative cold import time of module, in milliseconds"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    for line in reversed(proc.stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return None
+
+
+def login_page_run():
+    """Time a cold render of the login page and list heavy modules it imported"""
+    code = LOGIN_PAGE_PROBE.format(path=str(ROOT / "main.py"), lazy=LAZY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--budget-ms", type=float, help="fail if the login page takes longer")
+    args = parser.parse_args()
+
+    results = {"imports_ms": {m: import_time_ms(m) for m in MODULES}}
+    results.update(login_page_run())
+
+    for module, ms in results["imports_ms"].items():
+        print(f"import {module:<22} {ms:8.1f} ms")
+    print(f"login page (cold)           {results['login_page_ms']:8.1f} ms")
+    print(f"heavy modules loaded        {', '.join(results['loaded']) or 'none'}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    failed = bool(results["loaded"] or results["exception"])
+    if args.budget_ms is not None and results["login_page_ms"] > args.budget_ms:
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
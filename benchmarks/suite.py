@@ -0,0 +1,302 @@
+"""Offline latency benchmarks for Ultra Studio.
+
+Runs against benchmarks/fake_backend.py instead of the real Gemini and Imagen
+endpoints, so it costs no quota and can run in CI. Covers:
+
+- split_dialogue and the prompt builders at 10/100/1000 clips
+- image decoding for analysis and preview/download encoding
+- a full Video Generator run (character analysis, split, clip prompts) per
+  clip mode, at 10/100/1000 clips
+- an AI Image Creator run (Imagen call, store, previews)
+
+Run from the repo root:
+
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --compare bench.json --tolerance 0.25
+
+Every result is keyed by name and parameters, e.g.
+"video_generator[clips=100,mode=batched]", with timings in milliseconds, so
+two result files from different commits can be compared directly.
+--compare exits non-zero when any median regressed by more than --tolerance.
+"""
+import argparse
+import importlib
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fake_backend import FakeBackend, Latency, fake_image  # noqa: E402
+from studio import Studio  # noqa: E402
+from studio.clients import ClientRegistry, RateLimiter  # noqa: E402
+from studio.dialogue import split_dialogue  # noqa: E402
+from studio.generators import (  # noqa: E402
+    CLIP_MODES, build_batch_prompt, build_clip_prompt, build_script_prompt, build_viral_prompt, plan_clip_batches,
+)
+from studio.imaging import (  # noqa: E402
+    DOWNLOAD_FORMATS, encode_download, encode_parallel, encode_preview, load_for_analysis, to_pil,
+)
+from studio.metrics import CallLog, percentile  # noqa: E402
+from studio.sdk import HEAVY_MODULES  # noqa: E402
+
+CLIP_COUNTS = (10, 100, 1000)
+BENCH_KEY = "AIzaBENCHMARK"
+CHARACTER = (
+    "A woman in her early thirties with shoulder-length dark curly hair, warm brown skin and "
+    "a small scar above her left eyebrow. She wears a mustard corduroy jacket over a white tee."
+)
+WORDS = ("we", "never", "planned", "to", "build", "this", "but", "the", "market", "kept",
+         "asking", "so", "here", "is", "what", "happened", "next", "today")
+
+
+def make_script(clips):
+    """Script that split_dialogue turns into exactly `clips` clips (one 9-12 word sentence each)"""
+    sentences = []
+    for i in range(clips):
+        length = 9 + i % 4
+        words = [WORDS[(i + j) % len(WORDS)] for j in range(length)]
+        sentences.append(" ".join(words).capitalize() + ("?" if i % 5 == 4 else "."))
+    return " ".join(sentences)
+
+
+def summarize(samples, **extra):
+    """Timing statistics in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": percentile(ordered, 95),
+        **extra,
+    }
+
+
+def micro(fn, repeat):
+    """Per-call time of a fast function, timeit-style: best loop count, several repeats"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return summarize([t / number * 1000 for t in timer.repeat(repeat, number)], loops=number)
+
+
+def timed(fn, repeat):
+    """Wall time of a slow function run `repeat` times; returns (stats, last result)"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples), result
+
+
+def key(name, **params):
+    return f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]" if params else name
+
+
+def bench_text(results, clip_counts, repeat):
+    for n in clip_counts:
+        script = make_script(n)
+        clips = split_dialogue(script)
+        assert len(clips) == n, f"expected {n} clips, got {len(clips)}"
+        results[key("split_dialogue", clips=n)] = micro(lambda: split_dialogue(script), repeat)
+        results[key("build_clip_prompts", clips=n)] = micro(
+            lambda: [build_clip_prompt(i, c, CHARACTER, "Strict Realism") for i, c in enumerate(clips)], repeat)
+        results[key("build_batch_prompts", clips=n)] = micro(
+            lambda: [build_batch_prompt(b, clips, CHARACTER, "Strict Realism") for b in plan_clip_batches(clips)],
+            repeat)
+        results[key("build_script_prompt", clips=n)] = micro(
+            lambda: build_script_prompt(script, "🎯 Viral Hook", "Keep Original"), repeat)
+    results[key("build_viral_prompt")] = micro(
+        lambda: build_viral_prompt("home espresso", ["YouTube", "TikTok", "Instagram"], "Gen Z", "Funny"), repeat)
+
+
+def bench_images(results, size, repeat):
+    png = fake_image(size)
+    jpeg = fake_image(size, "JPEG")
+    image = to_pil(png)
+    image.load()
+    results[key("decode_for_analysis", size=size, format="jpeg")] = micro(lambda: load_for_analysis(jpeg), repeat)
+    results[key("decode_for_analysis", size=size, format="png")] = micro(lambda: load_for_analysis(png), repeat)
+    results[key("encode_preview", size=size)] = micro(lambda: encode_preview(image), repeat)
+    for fmt, level in (("PNG", 6), ("WebP (lossless)", 6), ("JPEG", 90)):
+        results[key("encode_download", size=size, format=DOWNLOAD_FORMATS[fmt]["ext"])] = micro(
+            lambda: encode_download(image, fmt, level), repeat)
+    results[key("encode_preview_parallel", size=size, images=4)] = micro(
+        lambda: encode_parallel(encode_preview, [image] * 4), repeat)
+
+
+def new_studio(backend, cache_dir, real_limits):
+    """Studio wired to the fake backend, with an in-memory call log"""
+    limiter = RateLimiter() if real_limits else RateLimiter(limits={})
+    registry = ClientRegistry(limiter=limiter, calls=CallLog(), client_factory=backend.client)
+    return Studio(cache_dir, registry)
+
+
+def upstream(studio, backend, since, runs):
+    """Upstream call counters since a timestamp, averaged per run"""
+    summary = studio.calls.summary(since=since)
+    rows = summary["rows"]
+    totals = {
+        "upstream_calls": summary["calls"],
+        "upstream_errors": summary["errors"],
+        "retries": sum(r["retries"] for r in rows),
+        "injected_429s": backend.counts["rate_limited"],
+        "prompt_tokens": sum(r["prompt_tokens"] for r in rows),
+        "output_tokens": sum(r["output_tokens"] for r in rows),
+    }
+    return {name: value / runs for name, value in totals.items()}
+
+
+def bench_video_generator(results, backend, studio, clip_counts, modes, workers, repeat):
+    """Character analysis plus a whole script's clip prompts, as tab 2 does it"""
+    character_image = fake_image(backend.image_size, "JPEG")
+    for n in clip_counts:
+        script = make_script(n)
+        for mode in modes:
+            backend.reset()
+            since = time.time()
+
+            def run():
+                description, _ = studio.analyze_character(BENCH_KEY, character_image, use_cache=False)
+                return studio.video_prompts(BENCH_KEY, script, str(description), mode=mode,
+                                            max_workers=workers, use_cache=False)
+
+            stats, (clips, prompts, report) = timed(run, repeat)
+            failed = sum(1 for p in prompts if not isinstance(p, str))
+            stats.update(upstream(studio, backend, since, repeat))
+            stats.update(clips=len(clips), failed_clips=failed, clips_per_s=len(clips) / (stats["median"] / 1000),
+                         prefix_sent_tokens=report["sent_tokens"])
+            results[key("video_generator", clips=n, mode=mode)] = stats
+
+
+def bench_image_creator(results, backend, studio, repeat, images=4):
+    """One Imagen call, stored and turned into previews, as tab 3 does it"""
+    backend.reset()
+    since = time.time()
+
+    def run():
+        digests, error, _ = studio.create_images(BENCH_KEY, "a lighthouse at dusk", images, use_cache=False)
+        if error:
+            return error
+        return encode_parallel(encode_preview, [studio.images.load(d) for d in digests])
+
+    stats, _ = timed(run, repeat)
+    stats.update(upstream(studio, backend, since, repeat))
+    results[key("image_creator", images=images, size=backend.image_size)] = stats
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print median changes against a baseline file; returns the regressed keys"""
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    regressed = []
+    print(f"\n{'benchmark':<58} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if not old:
+            print(f"{name:<58} {'-':>10} {stats['median']:10.4f} {'new':>8}")
+            continue
+        ratio = stats["median"] / old["median"] if old["median"] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressed.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:<58} {old['median']:10.4f} {stats['median']:10.4f} {ratio - 1:+8.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON results to compare medians against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed median slowdown with --compare")
+    parser.add_argument("--clips", type=int, nargs="+", default=list(CLIP_COUNTS), help="clip counts to run")
+    parser.add_argument("--modes", nargs="+", default=list(CLIP_MODES), choices=CLIP_MODES,
+                        help="Video Generator clip modes")
+    parser.add_argument("--workers", type=int, default=4, help="max_workers for clip generation")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per microbenchmark")
+    parser.add_argument("--run-repeat", type=int, default=3, help="repeats per full tab run")
+    parser.add_argument("--text-latency", type=Latency.parse, default=Latency.parse("lognormal:20:0.5"),
+                        help="fake Gemini latency, e.g. fixed:50, uniform:20:80, lognormal:800:0.4")
+    parser.add_argument("--image-latency", type=Latency.parse, default=Latency.parse("lognormal:60:0.3"),
+                        help="fake Imagen latency")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="fraction of calls answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="retry hint in injected 429s, seconds")
+    parser.add_argument("--image-size", type=int, default=1024, help="side of fake images, pixels")
+    parser.add_argument("--real-limits", action="store_true", help="apply the app's per-key rate limits")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latencies and injected errors")
+    parser.add_argument("--skip", nargs="+", default=[], choices=["text", "images", "video", "image-creator"])
+    args = parser.parse_args()
+
+    backend = FakeBackend(args.text_latency, args.image_latency, args.error_rate, args.retry_after,
+                          args.image_size, args.seed)
+    # Cold imports are startup.py's concern; keep them out of the first timed run
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        studio = new_studio(backend, cache_dir, args.real_limits)
+        if "text" not in args.skip:
+            bench_text(results, args.clips, args.repeat)
+        if "images" not in args.skip:
+            bench_images(results, args.image_size, args.repeat)
+        if "video" not in args.skip:
+            bench_video_generator(results, backend, studio, args.clips, args.modes, args.workers, args.run_repeat)
+        if "image-creator" not in args.skip:
+            bench_image_creator(results, backend, studio, args.run_repeat)
+
+    for name, stats in results.items():
+        extra = ""
+        if "upstream_calls" in stats:
+            extra = f"  calls={stats['upstream_calls']:g} retries={stats['retries']:g} 429s={stats['injected_429s']:g}"
+        print(f"{name:<58} median {stats['median']:10.4f} ms  p95 {stats['p95']:10.4f} ms{extra}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            "text_latency": str(args.text_latency),
+            "image_latency": str(args.image_latency),
+            "error_rate": args.error_rate,
+            "retry_after": args.retry_after,
+            "image_size": args.image_size,
+            "workers": args.workers,
+            "real_limits": args.real_limits,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressed = compare(results, args.compare, args.tolerance)
+        if regressed:
+            print(f"\n{len(regressed)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,38 @@
 import streamlit as st
-import google.generativeai as genai
-from google import genai as genai_client
-from PIL import Image
 import time
 from datetime import datetime
-import json
-import io
+import hashlib
+import functools
+import importlib
+import os
+import threading
+from pathlib import Path
+
+from studio import DEMO_KEY, IMAGE_MODEL, TEXT_MODEL, GenerationError, Studio, key_hash, split_dialogue, tracing
+from studio.api import DEFAULT_CACHE_DIR
+from studio.generators import plan_clip_batches, build_image_generation_prompt, stream_concurrently
+from studio.imaging import DOWNLOAD_FORMATS, encode_download, encode_parallel, encode_preview
+from studio.sdk import HEAVY_MODULES
+from studio.similarity import NEAR_DUPLICATE_THRESHOLD
+
+@st.cache_resource
+def start_prewarm():
+    """Import the heavy modules on a background thread, once per process"""
+    def run():
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+    thread = threading.Thread(target=run, name="sdk-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource
+def start_tracing():
+    """Span exporter from ULTRA_STUDIO_TRACE (console, file or a path), once per process"""
+    return tracing.configure_from_env(DEFAULT_CACHE_DIR)
+
+SCRIPT_STARTED = time.perf_counter()
+start_tracing()
+rerun_span = tracing.begin("rerun")
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -15,538 +42,189 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# --- Ultra Modern CSS ---
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&family=Manrope:wght@400;500;600;700;800&display=swap');
-    
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* === LOGIN PAGE === */
-    .login-container {
-        min-height: 100vh;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 2rem;
-    }
-    
-    .login-box {
-        background: rgba(255, 255, 255, 0.95);
-        backdrop-filter: blur(10px);
-        border-radius: 32px;
-        padding: 3rem 2.5rem;
-        max-width: 480px;
-        width: 100%;
-        box-shadow: 0 30px 90px rgba(0, 0, 0, 0.2);
-        animation: slideUp 0.5s ease-out;
-    }
-    
-    @keyframes slideUp {
-        from {
-            opacity: 0;
-            transform: translateY(30px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .login-logo {
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    
-    .login-logo-icon {
-        font-size: 4em;
-        margin-bottom: 1rem;
-        display: inline-block;
-        animation: float 3s ease-in-out infinite;
-    }
-    
-    @keyframes float {
-        0%, 100% { transform: translateY(0px); }
-        50% { transform: translateY(-10px); }
-    }
-    
-    .login-title {
-        font-size: 2.5em;
-        font-weight: 800;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 0.5rem;
-        font-family: 'Manrope', sans-serif;
-    }
-    
-    .login-subtitle {
-        color: #64748b;
-        font-size: 1.1em;
-        margin-bottom: 2rem;
-    }
-    
-    /* === MAIN APP === */
-    .stApp {
-        background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-    }
-    
-    .main {
-        padding: 0;
-        max-width: 100%;
-    }
-    
-    /* === NAVBAR === */
-    .navbar {
-        background: white;
-        padding: 1rem 3rem;
-        box-shadow: 0 2px 20px rgba(0, 0, 0, 0.05);
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        position: sticky;
-        top: 0;
-        z-index: 1000;
-        margin-bottom: 2rem;
-    }
-    
-    .navbar-brand {
-        font-size: 1.8em;
-        font-weight: 800;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        font-family: 'Manrope', sans-serif;
-    }
-    
-    .navbar-stats {
-        display: flex;
-        gap: 2rem;
-        align-items: center;
-    }
-    
-    .stat-item {
-        text-align: center;
-    }
-    
-    .stat-value {
-        font-size: 1.5em;
-        font-weight: 700;
-        color: #667eea;
-    }
-    
-    .stat-label {
-        font-size: 0.85em;
-        color: #64748b;
-        margin-top: 0.2rem;
-    }
-    
-    /* === HERO SECTION === */
-    .hero-section {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 32px;
-        padding: 4rem 3rem;
-        margin: 0 3rem 3rem 3rem;
-        text-align: center;
-        position: relative;
-        overflow: hidden;
-        box-shadow: 0 20px 60px rgba(102, 126, 234, 0.3);
-    }
-    
-    .hero-section::before {
-        content: '';
-        position: absolute;
-        top: -50%;
-        right: -50%;
-        width: 200%;
-        height: 200%;
-        background: radial-gradient(circle, rgba(255,255,255,0.1) 0%, transparent 70%);
-        animation: rotate 20s linear infinite;
-    }
-    
-    @keyframes rotate {
-        from { transform: rotate(0deg); }
-        to { transform: rotate(360deg); }
-    }
-    
-    .hero-title {
-        font-size: 3.5em;
-        font-weight: 900;
-        color: white;
-        margin-bottom: 1rem;
-        position: relative;
-        z-index: 1;
-        font-family: 'Manrope', sans-serif;
-    }
-    
-    .hero-subtitle {
-        font-size: 1.3em;
-        color: rgba(255, 255, 255, 0.95);
-        margin-bottom: 2rem;
-        position: relative;
-        z-index: 1;
-    }
-    
-    .hero-features {
-        display: flex;
-        justify-content: center;
-        gap: 3rem;
-        margin-top: 2rem;
-        position: relative;
-        z-index: 1;
-    }
-    
-    .hero-feature {
-        color: white;
-        font-size: 1.1em;
-    }
-    
-    .hero-feature-icon {
-        font-size: 2em;
-        margin-bottom: 0.5rem;
-        display: block;
-    }
-    
-    /* === TABS === */
-    .stTabs {
-        background: white;
-        border-radius: 24px;
-        padding: 2rem;
-        margin: 0 3rem 3rem 3rem;
-        box-shadow: 0 4px 30px rgba(0, 0, 0, 0.08);
-    }
-    
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 1rem;
-        background: #f8f9fa;
-        border-radius: 16px;
-        padding: 0.5rem;
-        margin-bottom: 2rem;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        border-radius: 12px !important;
-        padding: 1rem 2rem !important;
-        font-weight: 600 !important;
-        color: #64748b !important;
-        border: none !important;
-        font-size: 1.05em !important;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
-        color: white !important;
-    }
-    
-    /* === CARDS === */
-    .feature-card {
-        background: white;
-        border-radius: 20px;
-        padding: 2.5rem;
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.06);
-        border: 2px solid #f1f5f9;
-        transition: all 0.3s ease;
-        height: 100%;
-    }
-    
-    .feature-card:hover {
-        transform: translateY(-8px);
-        box-shadow: 0 12px 40px rgba(102, 126, 234, 0.15);
-        border-color: #667eea;
-    }
-    
-    /* === INPUT FIELDS === */
-    .stTextArea textarea, .stTextInput input {
-        border-radius: 16px !important;
-        border: 2px solid #e2e8f0 !important;
-        padding: 1rem !important;
-        font-size: 1rem !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stTextArea textarea:focus, .stTextInput input:focus {
-        border-color: #667eea !important;
-        box-shadow: 0 0 0 4px rgba(102, 126, 234, 0.1) !important;
-        outline: none !important;
-    }
-    
-    /* === BUTTONS === */
-    .stButton button {
-        border-radius: 14px !important;
-        padding: 0.8rem 2rem !important;
-        font-weight: 600 !important;
-        font-size: 1.05em !important;
-        border: none !important;
-        transition: all 0.3s ease !important;
-        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-    }
-    
-    .stButton button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 24px rgba(0, 0, 0, 0.15) !important;
-    }
-    
-    .stButton button[kind="primary"] {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
-        color: white !important;
-    }
-    
-    .stButton button[kind="secondary"] {
-        background: white !important;
-        border: 2px solid #e2e8f0 !important;
-        color: #475569 !important;
-    }
-    
-    /* === SELECT BOXES === */
-    .stSelectbox > div > div {
-        border-radius: 14px !important;
-        border: 2px solid #e2e8f0 !important;
-    }
-    
-    /* === FILE UPLOADER === */
-    [data-testid="stFileUploader"] {
-        border-radius: 20px !important;
-        border: 3px dashed #cbd5e1 !important;
-        padding: 2rem !important;
-        background: #f8f9fa !important;
-        transition: all 0.3s ease;
-    }
-    
-    [data-testid="stFileUploader"]:hover {
-        border-color: #667eea !important;
-        background: white !important;
-    }
-    
-    /* === PROGRESS BAR === */
-    .stProgress > div > div {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%) !important;
-        border-radius: 10px !important;
-    }
-    
-    /* === ALERTS === */
-    .stSuccess, .stError, .stWarning, .stInfo {
-        border-radius: 16px !important;
-        padding: 1.2rem !important;
-        border-left: 4px solid !important;
-        animation: slideIn 0.3s ease;
-    }
-    
-    @keyframes slideIn {
-        from {
-            opacity: 0;
-            transform: translateX(-20px);
-        }
-        to {
-            opacity: 1;
-            transform: translateX(0);
-        }
-    }
-    
-    /* === EXPANDER === */
-    .streamlit-expanderHeader {
-        border-radius: 14px !important;
-        background: white !important;
-        font-weight: 600 !important;
-        padding: 1.2rem !important;
-        border: 2px solid #e2e8f0 !important;
-    }
-    
-    .streamlit-expanderHeader:hover {
-        border-color: #667eea !important;
-        background: #f8f9ff !important;
-    }
-    
-    /* === LOGOUT BUTTON === */
-    .logout-btn {
-        background: white !important;
-        border: 2px solid #fee2e2 !important;
-        color: #dc2626 !important;
-        border-radius: 12px !important;
-        padding: 0.6rem 1.5rem !important;
-        font-weight: 600 !important;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-    
-    .logout-btn:hover {
-        background: #fee2e2 !important;
-        transform: scale(1.05);
-    }
-    
-    /* === HIDE DEFAULTS === */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    [data-testid="stSidebar"] {display: none;}
-    
-    /* === RESPONSIVE === */
-    @media (max-width: 768px) {
-        .hero-title { font-size: 2em; }
-        .navbar { padding: 1rem; }
-        .stTabs { margin: 0 1rem 1rem 1rem; }
-        .hero-section { margin: 0 1rem 1rem 1rem; padding: 2rem 1.5rem; }
-        .hero-features { flex-direction: column; gap: 1rem; }
-    }
-    </style>
-""", unsafe_allow_html=True)
+# --- Theme ---
+THEME_PATH = Path(__file__).parent / "static" / "theme.css"
+
+@st.cache_data(show_spinner=False)
+def load_theme():
+    """Theme CSS and a short content hash used to bust the browser cache"""
+    css = THEME_PATH.read_text(encoding="utf-8")
+    return css, hashlib.sha256(css.encode("utf-8")).hexdigest()[:10]
+
+def compact_html(html):
+    """Strip indentation so reruns don't resend it"""
+    return "".join(line.strip() for line in html.splitlines())
+
+def inject_theme():
+    """Link the cached static stylesheet, or inline it when static serving is off"""
+    css, version = load_theme()
+    if st.get_option("server.enableStaticServing"):
+        st.markdown(f'<link rel="stylesheet" href="app/static/theme.css?v={version}">', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+
+with tracing.span("theme"):
+    inject_theme()
 
 # --- Initialize Session State ---
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 if 'api_key' not in st.session_state:
     st.session_state.api_key = ""
-if 'generated_prompts' not in st.session_state:
-    st.session_state.generated_prompts = []
-if 'api_calls_count' not in st.session_state:
-    st.session_state.api_calls_count = 0
 if 'img_description' not in st.session_state:
     st.session_state.img_description = ''
-if 'last_image_gen_time' not in st.session_state:
-    st.session_state.last_image_gen_time = 0
+if 'available_models' not in st.session_state:
+    st.session_state.available_models = []
+
+# --- Studio ---
+@st.cache_resource
+def get_studio():
+    """Process-wide Studio: pooled clients, limits, response cache and image store"""
+    return Studio()
+
+@st.cache_data(ttl=900, show_spinner=False)
+def check_api_key(ident, _api_key):
+    """Validate a key via the (free) model listing and return the model names it can use
+    
+    Memoized per key hash; _api_key is excluded from the cache key. Failures raise
+    and are therefore never cached.
+    """
+    return get_studio().check_key(_api_key)
 
 # --- Helper Functions ---
-def safe_generate(prompt, model):
-    """Safe API call with error handling"""
-    # Check if demo mode
-    if model is None:
-        return "🎮 **Demo Mode Active**\n\nThis is a preview of what the AI would generate. To use real AI features, please:\n1. Logout\n2. Get a free API key from ai.google.dev\n3. Login with your API key\n\n[Sample output would appear here]"
-    
-    try:
-        response = model.generate_content(prompt)
-        st.session_state.api_calls_count += 1
-        return response.text.strip()
-    except Exception as e:
-        error_msg = str(e)
-        if "429" in error_msg or "ResourceExhausted" in error_msg:
-            return "⏳ Rate limit reached. Please wait 60 seconds."
-        elif "quota" in error_msg.lower():
-            return "💳 API quota exceeded."
-        elif "invalid" in error_msg.lower():
-            return "🔑 Invalid API key."
-        else:
-            return f"⚠️ Error: {error_msg}"
+def cache_enabled():
+    """The session's "Reuse cached responses" toggle"""
+    return st.session_state.get("use_cache", True)
 
-def analyze_image(image_file, model):
-    """Analyze uploaded image"""
-    # Check if demo mode
-    if model is None:
-        return "🎮 **Demo Mode** - Image analysis not available. Login with API key to use this feature."
-    
-    try:
-        img = Image.open(image_file)
-        if max(img.size) > 1024:
-            img.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
-        
-        prompt = """Analyze this image for AI video generation. Describe:
-        1. Physical appearance (face, features, expressions)
-        2. Hair (style, color, length)
-        3. Clothing and accessories
-        4. Age range and gender
-        5. Overall style and vibe
-        
-        Be specific and concise for AI prompts."""
-        
-        response = model.generate_content([prompt, img])
-        st.session_state.api_calls_count += 1
-        return response.text.strip()
-    except Exception as e:
-        return f"⚠️ Analysis failed: {str(e)}"
-
-def split_dialogue(text, max_words=15):
-    """Split dialogue into clips"""
-    if not text:
-        return []
-    
-    sentences = text.replace('!', '.').replace('?', '.').split('.')
-    sentences = [s.strip() for s in sentences if s.strip()]
-    
-    clips = []
-    current = []
-    word_count = 0
-    
-    for sentence in sentences:
-        words = sentence.split()
-        
-        if len(words) > max_words:
-            if current:
-                clips.append(" ".join(current))
-                current = []
-                word_count = 0
-            
-            for i in range(0, len(words), max_words):
-                clips.append(" ".join(words[i:i+max_words]))
-        else:
-            if word_count + len(words) > max_words:
-                clips.append(" ".join(current))
-                current = [sentence]
-                word_count = len(words)
-            else:
-                current.append(sentence)
-                word_count += len(words)
-    
-    if current:
-        clips.append(" ".join(current))
+def similarity_threshold(fresh_key):
+    """Near-duplicate threshold for a request, or None when the user asked for a fresh result"""
+    if st.session_state.pop(fresh_key, False):
+        return None
+    return st.session_state.get("near_duplicate_threshold", NEAR_DUPLICATE_THRESHOLD)
+
+def request_fresh(fresh_key):
+    st.session_state[fresh_key] = True
+
+def render_reuse_notice(stream, fresh_key):
+    """Say when a result came from a near-identical earlier request, with a way to regenerate"""
+    if stream.similarity is None:
+        return
+    st.info(f"♻️ Reused the result of an earlier request {stream.similarity:.0%} similar to this one: no API call made.")
+    st.button("🔄 Generate fresh", key=f"{fresh_key}_button", on_click=request_fresh, args=(fresh_key,))
+
+def remember(tab, input_text, output, style="", **meta):
+    """Save a result to this key's history (demo placeholders aren't kept)"""
+    if not is_demo:
+        studio.history.add(key_hash(api_key), tab, input_text, output, style, meta)
+
+def render_stream(stream, placeholder):
+    """Render a TextStream into placeholder as tokens arrive and return the final result
+    
+    The placeholder is cleared once the full text is in, so callers render the
+    final result (and run their checks on it) themselves.
+    """
+    for text in stream:
+        placeholder.markdown(text + " ▌")
+    placeholder.empty()
+    return stream.result
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def split_clips(text, max_words=15):
+    """split_dialogue memoized on (text, max_words)
     
-    return clips
+    The clip-count preview and the generation run in tab2 share one computation.
+    """
+    return split_dialogue(text, max_words)
 
-def generate_image_ai(prompt, api_key, number_of_images=1):
-    """Generate images using Imagen 4.0 model"""
-    try:
-        # Create client with API key
-        client = genai_client.Client(api_key=api_key)
-        
-        # Add a small delay to avoid rate limiting
-        time.sleep(2)
-        
-        # Generate images using Imagen 4.0
-        from google.genai import types
-        
-        response = client.models.generate_images(
-            model='imagen-4.0-generate-001',
-            prompt=prompt,
-            config=types.GenerateImagesConfig(
-                number_of_images=number_of_images,
+CLIP_MODE_LABELS = {
+    "📦 Batched": "batched",
+    "🧩 Grouped": "grouped",
+    "⚡ Concurrent": "concurrent",
+    "🐢 Sequential": "sequential",
+}
+
+def render_clip(index, result):
+    """Show one generated clip prompt"""
+    with st.expander(f"🎬 Clip {index+1}", expanded=(index==0)):
+        if not isinstance(result, GenerationError):
+            st.code(result, language="text")
+            st.download_button(
+                "💾 Download",
+                data=result,
+                file_name=f"clip_{index+1}.txt",
+                key=f"dl_{index}"
             )
-        )
-        
-        # Extract all generated images
-        if response.generated_images and len(response.generated_images) > 0:
-            images = [img.image for img in response.generated_images]
-            st.session_state.api_calls_count += 1
-            return images, None
-        
-        return None, "No images generated in response"
-        
-    except Exception as e:
-        error_msg = str(e)
-        
-        # Detailed error logging for debugging
-        print(f"Full error: {error_msg}")
-        
-        if "429" in error_msg or "ResourceExhausted" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-            return None, "⏳ Rate limit. Wait 60 seconds and try again."
-        elif "quota" in error_msg.lower() or "QUOTA" in error_msg:
-            return None, "💳 API quota exceeded. Check your quota at ai.google.dev"
-        elif "invalid" in error_msg.lower() or "API_KEY_INVALID" in error_msg:
-            return None, "🔑 Invalid API key for image generation."
-        elif "not found" in error_msg.lower() or "NOT_FOUND" in error_msg:
-            return None, "⚠️ Model 'imagen-4.0-generate-001' not found. Make sure it's enabled for your API key."
-        elif "permission" in error_msg.lower() or "PERMISSION_DENIED" in error_msg:
-            return None, "🚫 No permission to use Imagen. Check API settings."
-        elif "FAILED_PRECONDITION" in error_msg:
-            return None, "⚠️ Imagen 4.0 not available in your region yet. Try again later."
         else:
-            return None, f"⚠️ Error: {error_msg}"
+            st.warning(str(result))
+
+# --- Image Encoding ---
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_previews(digests):
+    """Preview WebPs for the stored images still present (memoized by digest)"""
+    return encode_parallel(encode_preview, load_blobs(digests))
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_downloads(digests, fmt, level):
+    """Full-resolution encodes for the stored images still present (memoized by digest and format)"""
+    return encode_parallel(encode_download, load_blobs(digests), fmt, level)
+
+def load_blobs(digests):
+    """Encoded bytes of each digest, skipping blobs the store's size cap has evicted"""
+    store = get_studio().images
+    return [data for data in map(store.load, digests) if data is not None]
+
+def render_evicted(digests, previews):
+    if len(previews) < len(digests):
+        st.caption(f"🗑️ {len(digests) - len(previews)} image(s) no longer stored: "
+                   f"older images are evicted to keep the image store under its size limit.")
+
+def render_image_results(results):
+    """Show previews of stored images, with full-resolution downloads encoded on request"""
+    digests = tuple(results["digests"])
+    previews = load_previews(digests)
+    render_evicted(digests, previews)
+    if not previews:
+        return
+    cols = st.columns(2) if len(previews) > 1 else [st.container()]
+    for idx, preview in enumerate(previews):
+        with cols[idx % len(cols)]:
+            caption = "Generated Image" if len(previews) == 1 else f"Variation {idx + 1}"
+            st.image(preview, use_container_width=True, caption=caption)
+    
+    st.markdown("---")
+    col_fmt, col_level = st.columns(2)
+    with col_fmt:
+        fmt = st.selectbox("Download format", list(DOWNLOAD_FORMATS), key="download_format")
+    with col_level:
+        if fmt == "JPEG":
+            level = st.slider("JPEG quality", 50, 100, 90, key="download_quality")
+        else:
+            level = st.slider("Compression level", 0, 9, 6, key="download_compression",
+                              help="Higher is smaller but slower to encode")
+    
+    variant = (fmt, level)
+    if variant not in results["prepared"]:
+        if st.button("📦 Prepare Download", use_container_width=True, key="prepare_download"):
+            results["prepared"].add(variant)
+    
+    if variant in results["prepared"]:
+        with st.spinner("Encoding full-resolution images..."):
+            downloads = load_downloads(digests, fmt, level)
+        spec = DOWNLOAD_FORMATS[fmt]
+        for idx, data in enumerate(downloads):
+            label = "📥 Download Image" if len(downloads) == 1 else f"📥 Download #{idx + 1}"
+            st.download_button(
+                f"{label} ({len(data) / 1e6:.1f} MB)",
+                data=data,
+                file_name=f"ai_generated_{idx+1}_{results['stamp']}.{spec['ext']}",
+                mime=spec["mime"],
+                use_container_width=True,
+                key=f"download_{idx}"
+            )
 
 # --- LOGIN PAGE ---
 if not st.session_state.logged_in:
-    st.markdown("""
+    st.markdown(compact_html("""
     <div class="login-container">
         <div class="login-box">
             <div class="login-logo">
@@ -556,7 +234,7 @@ if not st.session_state.logged_in:
             </div>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """), unsafe_allow_html=True)
     
     # Login form in the center
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -580,18 +258,20 @@ if not st.session_state.logged_in:
                 if api_key_input.strip():
                     with st.spinner("🔍 Validating API key..."):
                         try:
-                            # Test API key with a simple request
-                            genai.configure(api_key=api_key_input)
-                            test_model = genai.GenerativeModel('gemini-3-flash-preview')
+                            # Listing models is free and doubles as a capability check
+                            with tracing.span("auth"):
+                                available = check_api_key(key_hash(api_key_input), api_key_input)
                             
-                            # Make a minimal test request
-                            response = test_model.generate_content("Hi")
+                            if TEXT_MODEL not in available:
+                                st.error(f"❌ This API key can't use {TEXT_MODEL}.")
+                                st.stop()
                             
                             # If we got here, the API key works
                             st.session_state.logged_in = True
                             st.session_state.api_key = api_key_input
+                            st.session_state.available_models = available
                             st.success("✅ Login successful! Redirecting...")
-                            time.sleep(1.5)
+                            rerun_span.end()
                             st.rerun()
                             
                         except Exception as e:
@@ -615,7 +295,8 @@ if not st.session_state.logged_in:
         st.markdown("**Don't have an API key?**")
         if st.button("🎮 Try Demo Mode", use_container_width=False, help="Explore the interface without API key"):
             st.session_state.logged_in = True
-            st.session_state.api_key = "DEMO_MODE"
+            st.session_state.api_key = DEMO_KEY
+            rerun_span.end()
             st.rerun()
         st.markdown("</div>", unsafe_allow_html=True)
         
@@ -653,19 +334,23 @@ if not st.session_state.logged_in:
             `AIzaSyXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX`
             """)
     
+    rerun_span.end()
     st.stop()
 
 # --- MAIN APPLICATION (After Login) ---
 
+with tracing.span("client_setup"):
+    # Warm the SDK imports while the user looks at the page (ULTRA_STUDIO_PREWARM=0 disables)
+    if os.environ.get("ULTRA_STUDIO_PREWARM", "1") != "0":
+        start_prewarm()
+    studio = get_studio()
+
 # Check if demo mode
-is_demo = (st.session_state.api_key == "DEMO_MODE")
+api_key = st.session_state.api_key
+is_demo = (api_key == DEMO_KEY)
+can_generate_images = not is_demo and IMAGE_MODEL in st.session_state.available_models
 
-# Configure API (skip if demo mode)
-if not is_demo:
-    genai.configure(api_key=st.session_state.api_key)
-    model = genai.GenerativeModel('gemini-3-flash-preview')
-else:
-    model = None
+if is_demo:
     # Show demo banner
     st.warning("🎮 **Demo Mode** - You're exploring the interface. Enter a real API key to use AI features.", icon="ℹ️")
 
@@ -681,13 +366,22 @@ with col1:
                 <div class="stat-value">{}</div>
                 <div class="stat-label">API Calls</div>
             </div>
+            <div class="stat-item">
+                <div class="stat-value">{}/{}</div>
+                <div class="stat-label">Cache Hit/Miss</div>
+            </div>
             <div class="stat-item">
                 <div class="stat-value">{}</div>
-                <div class="stat-label">Prompts</div>
+                <div class="stat-label">Saved</div>
             </div>
         </div>
     </div>
-    """.format(st.session_state.api_calls_count, len(st.session_state.generated_prompts)), unsafe_allow_html=True)
+    """.format(
+        studio.calls.count(key_hash(api_key)),
+        studio.cache.hits,
+        studio.cache.misses,
+        0 if is_demo else studio.history.count(key_hash(api_key))
+    ), unsafe_allow_html=True)
 
 with col2:
     st.markdown("<br>", unsafe_allow_html=True)
@@ -695,9 +389,25 @@ with col2:
         st.session_state.logged_in = False
         st.session_state.api_key = ""
         st.rerun()
+    st.checkbox("♻️ Reuse cached responses", value=True, key="use_cache", help="Untick to force a fresh API call")
+    st.slider(
+        "Near-duplicate match", 0.5, 1.0, NEAR_DUPLICATE_THRESHOLD, 0.05,
+        key="near_duplicate_threshold",
+        disabled=not cache_enabled(),
+        help="Reuse the result of an earlier request whose text is at least this similar (same tab and options)"
+    )
+
+# Paused models for this key (circuit breaker)
+if not is_demo:
+    for model_name, (state, reason, retry_at) in studio.registry.breaker.states(key_hash(api_key)).items():
+        if state == "open":
+            wait_min = max(1, int((retry_at - time.time()) // 60) + 1)
+            st.warning(f"🔌 **{model_name}** paused: {reason} Retrying automatically in ~{wait_min} min.")
+        else:
+            st.info(f"🔌 **{model_name}** recovering: the next request will test whether it's available again.")
 
 # --- HERO SECTION ---
-st.markdown("""
+st.markdown(compact_html("""
 <div class="hero-section">
     <h1 class="hero-title">Transform Ideas into Reality</h1>
     <p class="hero-subtitle">Professional AI-powered content creation for videos, images, and viral content</p>
@@ -724,20 +434,95 @@ st.markdown("""
         </div>
     </div>
 </div>
-""", unsafe_allow_html=True)
+"""), unsafe_allow_html=True)
+
+# --- Fragments ---
+def is_debug():
+    """Debug overlays are on with ?debug=1 or ULTRA_STUDIO_DEBUG=1"""
+    return st.query_params.get("debug") == "1" or os.environ.get("ULTRA_STUDIO_DEBUG") == "1"
+
+def timed_fragment(name):
+    """st.fragment, so widget changes rerun only this section; times each run in debug mode"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper():
+            started = time.perf_counter()
+            with tracing.span(f"tab:{name}"):
+                fn()
+            if is_debug():
+                elapsed = (time.perf_counter() - started) * 1000
+                st.session_state.setdefault("fragment_timings", {})[name] = elapsed
+                st.caption(f"⏱️ {name} fragment: {elapsed:.1f} ms")
+        return st.fragment(wrapper)
+    return decorator
 
 # --- TABS ---
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
     "📝 Script Doctor",
     "🎬 Video Generator",
     "🎨 AI Image Creator",
     "🖼️ Image Prompts",
-    "🚀 Viral Manager"
+    "🚀 Viral Manager",
+    "📚 History"
 ])
 
 # === TAB 1: SCRIPT DOCTOR ===
-with tab1:
+SCRIPT_STYLES = ["🎯 Viral Hook", "💼 Professional", "😂 Funny", "🎓 Educational",
+                 "💰 Sales", "🌏 Malayalam → English", "✨ Creative"]
+SCRIPT_LENGTHS = ["Keep Original", "Make Shorter", "Make Longer", "Expand Dramatically"]
+VARIANTS_PER_ROW = 3
+
+def compare_script_variants(raw_script, variants, parallel_requests):
+    """Run every (style, length) variant at once, filling a grid of panels as each finishes"""
+    slots = []
+    for start in range(0, len(variants), VARIANTS_PER_ROW):
+        for col, (style, length) in zip(st.columns(VARIANTS_PER_ROW), variants[start:start + VARIANTS_PER_ROW]):
+            with col:
+                st.markdown(f"**{style}** · {length}")
+                slots.append(st.empty())
+                slots[-1].caption("⏳ Waiting...")
+    
+    progress = st.progress(0)
+    started = time.perf_counter()
+    results = [None] * len(variants)
+    threshold = st.session_state.get("near_duplicate_threshold", NEAR_DUPLICATE_THRESHOLD)
+    outcomes = studio.script_doctor_variants(
+        api_key, raw_script, variants, use_cache=cache_enabled(), similarity=threshold, max_workers=parallel_requests
+    )
+    for done, (i, result, cached, seconds) in enumerate(outcomes, start=1):
+        results[i] = (result, cached, seconds)
+        progress.progress(done / len(variants))
+        with slots[i].container():
+            if isinstance(result, GenerationError):
+                st.error(str(result))
+                continue
+            st.text_area("Enhanced Script", value=result, height=250, key=f"variant_output_{i}",
+                         label_visibility="collapsed")
+            st.caption(f"📝 {len(result.split())} words · ⏱️ {seconds:.1f}s" + (" · ♻️ reused" if cached else ""))
+    elapsed = time.perf_counter() - started
+    
+    sections = [f"# Script Doctor comparison\n\n## Original ({len(raw_script.split())} words)\n\n{raw_script.strip()}"]
+    for (style, length), (result, _, seconds) in zip(variants, results):
+        if isinstance(result, GenerationError):
+            continue
+        remember("Script Doctor", raw_script, result, style, length=length)
+        sections.append(f"## {style} · {length} ({len(result.split())} words, {seconds:.1f}s)\n\n{result}")
+    if len(sections) == 1:
+        return
+    
+    slowest = max(seconds for _, _, seconds in results)
+    st.success(f"✅ {len(sections) - 1} of {len(variants)} variants in {elapsed:.1f}s (slowest {slowest:.1f}s)")
+    st.download_button(
+        "📥 Download comparison",
+        data="\n\n".join(sections),
+        file_name=f"compare_{datetime.now().strftime('%Y%m%d_%H%M')}.md",
+        use_container_width=True
+    )
+
+@timed_fragment("Script Doctor")
+def script_doctor_tab():
     col1, col2 = st.columns(2, gap="large")
+    compare_btn = False
     
     with col1:
         st.markdown("### 📥 Your Script")
@@ -748,47 +533,44 @@ with tab1:
             key="script_input"
         )
         
+        compare = st.toggle("⚖️ Compare styles", key="script_compare",
+                            help="Run several styles and lengths at once and read them side by side")
         col_a, col_b = st.columns(2)
-        with col_a:
-            mode = st.selectbox(
-                "Style",
-                ["🎯 Viral Hook", "💼 Professional", "😂 Funny", "🎓 Educational", 
-                 "💰 Sales", "🌏 Malayalam → English", "✨ Creative"]
-            )
-        
-        with col_b:
-            length = st.selectbox(
-                "Length",
-                ["Keep Original", "Make Shorter", "Make Longer", "Expand Dramatically"]
-            )
-        
-        enhance_btn = st.button("✨ Enhance Script", type="primary", use_container_width=True, key="enhance")
+        if compare:
+            with col_a:
+                styles = st.multiselect("Styles", SCRIPT_STYLES, default=SCRIPT_STYLES[:3], key="compare_styles")
+            with col_b:
+                lengths = st.multiselect("Lengths", SCRIPT_LENGTHS, default=SCRIPT_LENGTHS[:1], key="compare_lengths")
+            variants = [(style, length) for style in styles for length in lengths]
+            parallel_requests = st.slider("Parallel requests", 1, 8, 4, key="compare_workers")
+            compare_btn = st.button(f"⚖️ Compare {len(variants)} variant(s)", type="primary",
+                                    use_container_width=True, key="compare", disabled=not variants)
+            enhance_btn = False
+        else:
+            with col_a:
+                mode = st.selectbox("Style", SCRIPT_STYLES)
+            
+            with col_b:
+                length = st.selectbox("Length", SCRIPT_LENGTHS)
+            
+            enhance_btn = st.button("✨ Enhance Script", type="primary", use_container_width=True, key="enhance")
     
     with col2:
         st.markdown("### ✨ Enhanced Result")
         
-        if enhance_btn:
+        fresh = not compare and st.session_state.get("fresh_script_doctor", False)
+        if enhance_btn or fresh:
             if raw_script.strip():
+                stream_area = st.empty()
                 with st.spinner("🤖 Enhancing your script..."):
-                    prompt = f"""Rewrite this script professionally:
-
-Style: {mode}
-Length: {length}
-Input: {raw_script}
-
-Requirements:
-- Maintain core message
-- Apply {mode} style
-- {length}
-- Professional quality
-- Clear and engaging
-
-Output enhanced script only."""
-                    
-                    result = safe_generate(prompt, model)
+                    stream = studio.script_doctor(api_key, raw_script, mode, length, use_cache=cache_enabled(), stream=True,
+                                                  similarity=similarity_threshold("fresh_script_doctor"))
+                    result = render_stream(stream, stream_area)
                     
-                    if result and "Error" not in result:
+                    if result and not isinstance(result, GenerationError):
+                        remember("Script Doctor", raw_script, result, mode, length=length)
                         st.success("✅ Script enhanced!")
+                        render_reuse_notice(stream, "fresh_script_doctor")
                         st.text_area("Enhanced Script", value=result, height=300, key="enhanced_output")
                         
                         col_m1, col_m2 = st.columns(2)
@@ -804,12 +586,22 @@ Output enhanced script only."""
                             use_container_width=True
                         )
                     else:
-                        st.error(result)
+                        st.error(str(result))
             else:
                 st.warning("⚠️ Please enter content first")
+    
+    if compare_btn:
+        if raw_script.strip():
+            compare_script_variants(raw_script, variants, parallel_requests)
+        else:
+            st.warning("⚠️ Please enter content first")
+
+with tab1:
+    script_doctor_tab()
 
 # === TAB 2: VIDEO GENERATOR ===
-with tab2:
+@timed_fragment("Video Generator")
+def video_generator_tab():
     col1, col2 = st.columns(2, gap="large")
     
     with col1:
@@ -828,12 +620,21 @@ with tab2:
             with col_btn:
                 if st.button("🔍 Analyze", use_container_width=True):
                     with st.spinner("Analyzing..."):
-                        analysis = analyze_image(uploaded_file, model)
-                        if "Error" not in analysis:
+                        analysis, stats = studio.analyze_character(api_key, uploaded_file.getvalue(), use_cache=cache_enabled())
+                        if not isinstance(analysis, GenerationError):
                             st.session_state.img_description = analysis
+                            remember("Video Generator", uploaded_file.name, analysis, "Character analysis")
                             st.success("✅ Done!")
+                            if stats and stats["cached"]:
+                                st.caption(f"♻️ Cached · {stats['latency_ms']:.0f} ms")
+                            elif stats:
+                                w, h = stats["decoded_size"]
+                                st.caption(
+                                    f"⏱️ {stats['latency_ms']:.0f} ms · decoded at {w}×{h} "
+                                    f"({stats['decoded_bytes'] / 1e6:.1f} MB peak)"
+                                )
                         else:
-                            st.error(analysis)
+                            st.error(str(analysis))
         
         img_desc = st.text_area(
             "Character description",
@@ -858,8 +659,19 @@ with tab2:
         
         max_words = st.slider("Words per clip", 8, 25, 15)
         
+        col_mode, col_workers = st.columns(2)
+        with col_mode:
+            gen_mode = st.selectbox(
+                "Generation mode",
+                list(CLIP_MODE_LABELS),
+                help="Batched sends several clips per request; Grouped sends one batch per parallel request, "
+                     "so the shared prefix goes once per request; Concurrent sends one request per clip"
+            )
+        with col_workers:
+            parallel_requests = st.slider("Parallel requests", 1, 8, 4, disabled=(gen_mode == "🐢 Sequential"))
+        
         if script:
-            clips_preview = split_dialogue(script, max_words)
+            clips_preview = split_clips(script, max_words)
             st.info(f"📊 Will create {len(clips_preview)} clips")
         
         gen_btn = st.button("🚀 Generate Prompts", type="primary", use_container_width=True)
@@ -869,60 +681,59 @@ with tab2:
         
         if gen_btn:
             if img_desc.strip() and script.strip():
-                clips = split_dialogue(script, max_words)
+                clips = split_clips(script, max_words)
                 
                 progress = st.progress(0)
                 st.success(f"✅ Generating {len(clips)} prompts...")
                 
-                for i, clip in enumerate(clips):
-                    progress.progress((i + 1) / len(clips))
-                    
-                    style_name = visual_style.split(" ", 1)[1] if " " in visual_style else visual_style
+                clip_mode = CLIP_MODE_LABELS[gen_mode]
+                if clip_mode == "batched":
+                    batches = plan_clip_batches(clips)
+                    st.caption(f"📦 {len(batches)} request(s) for {len(clips)} clips")
+                with studio.clip_context(api_key, img_desc, visual_style, len(clips)) as context:
+                    results = studio.iter_clip_prompts(
+                        api_key, clips, img_desc, visual_style, clip_mode, parallel_requests, cache_enabled(), context
+                    )
                     
-                    prompt = f"""Create professional video prompt for AI tools.
-
-CLIP #{i+1}
-CHARACTER: {img_desc}
-DIALOGUE: "{clip}"
-STYLE: {style_name}
-
-Include:
-- Character description
-- Dialogue delivery
-- Facial expressions
-- Camera work
-- Lighting
-- Style elements
-
-Production-ready format."""
-                    
-                    result = safe_generate(prompt, model)
-                    
-                    with st.expander(f"🎬 Clip {i+1}", expanded=(i==0)):
-                        if "Error" not in result:
-                            st.code(result, language="text")
-                            st.download_button(
-                                "💾 Download",
-                                data=result,
-                                file_name=f"clip_{i+1}.txt",
-                                key=f"dl_{i}"
-                            )
-                        else:
-                            st.warning(result)
-                    
-                    if i < len(clips) - 1:
-                        time.sleep(1)
+                    # One slot per clip so results land in script order
+                    slots = [st.empty() for _ in clips]
+                    prompts = [None] * len(clips)
+                    for done, (i, result) in enumerate(results, start=1):
+                        prompts[i] = result
+                        progress.progress(done / len(clips))
+                        with slots[i].container():
+                            render_clip(i, result)
+                    report = context.report()
+                
+                generated = [(i, p) for i, p in enumerate(prompts) if not isinstance(p, GenerationError)]
+                if generated:
+                    remember(
+                        "Video Generator", script, "\n\n".join(f"Clip {i+1}: {p}" for i, p in generated),
+                        visual_style, character=img_desc, clips=len(clips), mode=clip_mode,
+                    )
                 
                 st.success("✅ All prompts generated!")
+                if report["requests"]:
+                    how = "cached once" if report["cached"] else f"sent in {report['requests']} request(s)"
+                    st.caption(
+                        f"🧠 Shared prefix ~{report['prefix_tokens']} tokens, {how} · "
+                        f"~{report['saved_tokens']} of {report['baseline_tokens']} prefix tokens saved"
+                    )
             else:
                 st.error("⚠️ Please provide character description and script")
 
+with tab2:
+    video_generator_tab()
+
 # === TAB 3: AI IMAGE CREATOR ===
-with tab3:
+@timed_fragment("AI Image Creator")
+def image_creator_tab():
     st.markdown("### 🎨 AI Image Creator")
     
     if is_demo:
         st.info("🎮 **Demo Mode** - Image generation requires a real API key. Please login to use this feature.")
+    elif not can_generate_images:
+        st.info(f"🚫 Your API key doesn't have access to `{IMAGE_MODEL}`. Enable Imagen for your project at [Google AI Studio](https://aistudio.google.com) and login again.")
     
     col1, col2 = st.columns([1, 1], gap="large")
     
@@ -999,118 +810,65 @@ with tab3:
                 placeholder="e.g., bokeh effect, lens flare, HDR...",
                 key="add_details_input"
             )
+            
+            seed = st.number_input(
+                "Seed (optional)",
+                min_value=0,
+                value=0,
+                help="Fixed seed for repeatable results; 0 means random",
+                key="seed_input"
+            )
         
         generate_img_btn = st.button(
             "🎨 Generate Image",
             type="primary",
             use_container_width=True,
-            disabled=is_demo,
+            disabled=not can_generate_images,
             key="generate_image_btn"
         )
-        
-        # Show cooldown timer if needed
-        current_time = time.time()
-        time_since_last = current_time - st.session_state.last_image_gen_time
-        cooldown_time = 3  # 3 seconds cooldown
-        
-        if time_since_last < cooldown_time:
-            remaining = int(cooldown_time - time_since_last)
-            st.info(f"⏰ Please wait {remaining} seconds before generating again...")
+
     
     with col2:
         st.markdown("#### 🖼️ Generated Image")
         
         if generate_img_btn:
-            # Check cooldown
-            current_time = time.time()
-            time_since_last = current_time - st.session_state.last_image_gen_time
-            
-            if time_since_last < 3:
-                st.warning(f"⏰ Please wait {int(3 - time_since_last)} more seconds...")
-            elif image_prompt.strip():
+            if image_prompt.strip():
                 # Build enhanced prompt
-                enhanced_prompt = f"{image_prompt}"
-                
-                if art_style != "Photorealistic":
-                    enhanced_prompt += f", {art_style} style"
-                
-                enhanced_prompt += f", {aspect_ratio.split()[0]} aspect ratio"
-                
-                if quality == "High Quality":
-                    enhanced_prompt += ", high quality, detailed"
-                elif quality == "Ultra HD 4K":
-                    enhanced_prompt += ", ultra HD 4K, extremely detailed, professional"
-                
-                if mood != "Natural":
-                    enhanced_prompt += f", {mood.lower()} atmosphere"
-                
-                if lighting != "Natural":
-                    enhanced_prompt += f", {lighting.lower()} lighting"
-                
-                if add_details:
-                    enhanced_prompt += f", {add_details}"
+                enhanced_prompt = build_image_generation_prompt(
+                    image_prompt, art_style, quality, aspect_ratio, mood, lighting, add_details
+                )
                 
                 # Show what we're generating
                 with st.expander("📋 Full Prompt Being Used", expanded=False):
                     st.code(enhanced_prompt, language="text")
                 
-                # Generate image
-                st.session_state.last_image_gen_time = time.time()
-                
+                # Generate image (a stored result for the same seeded request is reused when allowed)
                 with st.spinner(f"🎨 Creating {num_images} image(s)... This may take 10-30 seconds..."):
-                    generated_images, error = generate_image_ai(enhanced_prompt, st.session_state.api_key, num_images)
+                    digests, error, cached = studio.create_images(
+                        api_key, enhanced_prompt, num_images, seed or None, use_cache=cache_enabled()
+                    )
                     
-                    if generated_images:
-                        st.success(f"✅ {len(generated_images)} image(s) generated successfully!")
-                        
-                        # Display all images
-                        if len(generated_images) == 1:
-                            st.image(generated_images[0], use_container_width=True, caption="Generated Image")
-                            
-                            # Save to bytes for download
-                            img_bytes = io.BytesIO()
-                            generated_images[0].save(img_bytes, format='PNG')
-                            img_bytes.seek(0)
-                            
-                            # Download button
-                            st.download_button(
-                                "📥 Download Image",
-                                data=img_bytes,
-                                file_name=f"ai_generated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                                mime="image/png",
-                                use_container_width=True
-                            )
+                    if digests:
+                        if cached:
+                            st.success(f"♻️ Loaded {len(digests)} stored image(s) for this prompt")
                         else:
-                            # Display multiple images in grid
-                            cols = st.columns(2)
-                            for idx, img in enumerate(generated_images):
-                                with cols[idx % 2]:
-                                    st.image(img, use_container_width=True, caption=f"Variation {idx + 1}")
-                                    
-                                    # Individual download button
-                                    img_bytes = io.BytesIO()
-                                    img.save(img_bytes, format='PNG')
-                                    img_bytes.seek(0)
-                                    
-                                    st.download_button(
-                                        f"📥 Download #{idx + 1}",
-                                        data=img_bytes,
-                                        file_name=f"ai_generated_{idx+1}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                                        mime="image/png",
-                                        use_container_width=True,
-                                        key=f"download_{idx}"
-                                    )
+                            st.success(f"✅ {len(digests)} image(s) generated successfully!")
                         
-                        # Option to regenerate
-                        st.markdown("---")
-                        if st.button("🔄 Generate More", use_container_width=True):
-                            st.rerun()
+                        remember("AI Image Creator", image_prompt, enhanced_prompt, art_style,
+                                 images=digests, quality=quality, aspect=aspect_ratio)
+                        
+                        # Only references go into session state; pixels stay in the store
+                        st.session_state.image_results = {
+                            "digests": digests,
+                            "stamp": datetime.now().strftime('%Y%m%d_%H%M%S'),
+                            "prepared": set(),
+                        }
                         
                     else:
                         st.error(f"❌ {error}")
                         
                         # Detailed troubleshooting based on error
-                        if "Rate limit" in error or "quota" in error.lower():
+                        if error.kind in ("rate_limit", "quota"):
                             st.warning("""
                             **Rate Limit Solutions:**
                             
@@ -1121,7 +879,7 @@ with tab3:
                             💡 Free tier has limits - upgrade if needed
                             """)
                         
-                        elif "not found" in error.lower() or "not available" in error.lower():
+                        elif error.kind in ("not_found", "unavailable"):
                             st.info("""
                             **Model Access Issue:**
                             
@@ -1134,7 +892,7 @@ with tab3:
                             ✅ Model might be in limited preview - try again later
                             """)
                         
-                        elif "permission" in error.lower():
+                        elif error.kind == "permission":
                             st.info("""
                             **Permission Issue:**
                             
@@ -1149,10 +907,19 @@ with tab3:
                         
                         # Show raw error in expander
                         with st.expander("🔧 Technical Details"):
-                            st.code(error, language="text")
+                            st.code(error.detail or error.message, language="text")
             else:
                 st.warning("⚠️ Please describe what you want to create")
-        else:
+        
+        if st.session_state.get("image_results"):
+            render_image_results(st.session_state.image_results)
+            
+            # Option to regenerate
+            st.markdown("---")
+            if st.button("🔄 Generate More", use_container_width=True):
+                st.session_state.image_results = None
+                st.rerun(scope="fragment")
+        elif not generate_img_btn:
             # Placeholder
             st.markdown("""
             <div style='background: #f8f9fa; padding: 3rem 2rem; border-radius: 14px; text-align: center;'>
@@ -1179,10 +946,14 @@ with tab3:
             for example in examples:
                 if st.button(example, key=f"ex_{example}", use_container_width=True):
                     st.session_state.ai_image_prompt = example.split(" ", 1)[1]
-                    st.rerun()
+                    st.rerun(scope="fragment")
+
+with tab3:
+    image_creator_tab()
 
 # === TAB 4: IMAGE PROMPTS ===
-with tab4:
+@timed_fragment("Image Prompts")
+def image_prompts_tab():
     col1, col2 = st.columns(2, gap="large")
     
     with col1:
@@ -1218,30 +989,19 @@ with tab4:
     with col2:
         st.markdown("### 🎨 Generated Prompt")
         
-        if create_btn:
+        fresh = st.session_state.get("fresh_image_prompt", False)
+        if create_btn or fresh:
             if idea.strip():
+                stream_area = st.empty()
                 with st.spinner("🤖 Creating prompt..."):
-                    prompt = f"""Create professional image generation prompt:
-
-Vision: {idea}
-Style: {img_style}
-Aspect: {aspect}
-Detail: {detail}
-
-Include:
-- Main subject
-- Composition
-- Lighting
-- Color palette
-- Technical specs
-- Style keywords
-
-Format for Midjourney/DALL-E/Stable Diffusion"""
-                    
-                    result = safe_generate(prompt, model)
+                    stream = studio.image_prompt(api_key, idea, img_style, aspect, detail, use_cache=cache_enabled(), stream=True,
+                                                 similarity=similarity_threshold("fresh_image_prompt"))
+                    result = render_stream(stream, stream_area)
                     
-                    if result and "Error" not in result:
+                    if result and not isinstance(result, GenerationError):
+                        remember("Image Prompts", idea, result, img_style, aspect=aspect, detail=detail)
                         st.success("✅ Prompt created!")
+                        render_reuse_notice(stream, "fresh_image_prompt")
                         st.code(result, language="text")
                         
                         st.download_button(
@@ -1251,12 +1011,61 @@ Format for Midjourney/DALL-E/Stable Diffusion"""
                             use_container_width=True
                         )
                     else:
-                        st.error(result)
+                        st.error(str(result))
             else:
                 st.warning("⚠️ Please describe your image idea")
 
+with tab4:
+    image_prompts_tab()
+
 # === TAB 5: VIRAL MANAGER ===
-with tab5:
+def render_viral_package(topic, platforms, audience, tone):
+    """Generate every platform's section at once, each streaming into its own panel, then merge them"""
+    streams = studio.viral_platform_streams(api_key, topic, platforms, audience, tone, use_cache=cache_enabled(),
+                                            similarity=similarity_threshold("fresh_viral"))
+    panels = []
+    for name in platforms:
+        with st.container(border=True):
+            st.markdown(f"#### {name}")
+            panels.append(st.empty())
+            panels[-1].caption("⏳ Waiting...")
+    
+    started = time.perf_counter()
+    with st.spinner("🤖 Creating strategy..."):
+        for i, text, done in stream_concurrently(streams, max_workers=len(streams)):
+            if not done:
+                panels[i].markdown(text + " ▌")
+                continue
+            stream = streams[i]
+            with panels[i].container():
+                if isinstance(stream.result, GenerationError):
+                    st.error(str(stream.result))
+                    continue
+                st.markdown(stream.result)
+                reused = f" · ♻️ reused ({stream.similarity:.0%} similar)" if stream.similarity is not None else ""
+                st.caption(f"⏱️ {stream.seconds:.1f}s{reused}")
+    elapsed = time.perf_counter() - started
+    
+    sections = [
+        f"## {name}\n\n{stream.result}" for name, stream in zip(platforms, streams)
+        if stream.result and not isinstance(stream.result, GenerationError)
+    ]
+    if not sections:
+        return
+    package = f"# Viral package: {topic.strip()}\n\n" + "\n\n".join(sections)
+    remember("Viral Manager", topic, package, tone, platforms=platforms, audience=audience)
+    st.success(f"✅ {len(sections)} of {len(platforms)} platform(s) in {elapsed:.1f}s")
+    if any(stream.similarity is not None for stream in streams):
+        st.button("🔄 Generate fresh", key="fresh_viral_button", on_click=request_fresh, args=("fresh_viral",))
+    st.download_button(
+        "📥 Download Strategy",
+        data=package,
+        file_name=f"viral_{datetime.now().strftime('%Y%m%d_%H%M')}.md",
+        use_container_width=True
+    )
+
+@timed_fragment("Viral Manager")
+def viral_manager_tab():
     col1, col2 = st.columns(2, gap="large")
     
     with col1:
@@ -1290,56 +1099,160 @@ with tab5:
     with col2:
         st.markdown("### 💎 Viral Package")
         
-        if viral_btn:
-            if topic.strip():
-                with st.spinner("🤖 Creating strategy..."):
-                    prompt = f"""Create viral content strategy:
-
-Topic: {topic}
-Platforms: {', '.join(platform)}
-Audience: {audience}
-Tone: {tone}
-
-Generate:
-1. 5 Viral Titles
-2. SEO Description
-3. 30 Hashtags
-4. Call-to-Action options
-5. Hook Ideas
-6. Platform tips
-
-Professional format."""
-                    
-                    result = safe_generate(prompt, model)
-                    
-                    if result and "Error" not in result:
-                        st.success("✅ Strategy generated!")
-                        st.markdown(result)
-                        
-                        st.download_button(
-                            "📥 Download Strategy",
-                            data=result,
-                            file_name=f"viral_{datetime.now().strftime('%Y%m%d_%H%M')}.txt",
-                            use_container_width=True
-                        )
-                    else:
-                        st.error(result)
-            else:
+        fresh = st.session_state.get("fresh_viral", False)
+        if viral_btn or fresh:
+            if not topic.strip():
                 st.warning("⚠️ Please enter a topic")
+            elif not platform:
+                st.warning("⚠️ Please pick at least one platform")
+            else:
+                render_viral_package(topic, platform, audience, tone)
+
+with tab5:
+    viral_manager_tab()
+
+# === TAB 6: HISTORY ===
+HISTORY_TABS = ["All tabs", "Script Doctor", "Video Generator", "AI Image Creator", "Image Prompts", "Viral Manager"]
+HISTORY_PAGE_SIZE = 20
+
+def reset_history_pages():
+    st.session_state.history_cursors = []
+
+def open_history_entry(entry_id):
+    st.session_state.history_open = entry_id
+
+def render_history_entry(entry):
+    """The full text of one saved result"""
+    with st.container(border=True):
+        col_title, col_close = st.columns([5, 1])
+        with col_title:
+            st.markdown(f"#### {entry['tab']} · {entry['style']}")
+            st.caption(datetime.fromtimestamp(entry["created"]).strftime("%Y-%m-%d %H:%M"))
+        with col_close:
+            st.button("✖ Close", key="history_close", on_click=open_history_entry, args=(None,))
+        st.text_area("Input", value=entry["input"], height=120, disabled=True, key=f"history_in_{entry['id']}")
+        if entry["meta"].get("images"):
+            digests = tuple(entry["meta"]["images"])
+            previews = load_previews(digests)
+            render_evicted(digests, previews)
+            if previews:
+                cols = st.columns(min(len(previews), 4))
+                for idx, preview in enumerate(previews):
+                    cols[idx % len(cols)].image(preview, use_container_width=True)
+        st.text_area("Output", value=entry["output"], height=300, key=f"history_out_{entry['id']}")
+        st.download_button(
+            "📥 Download",
+            data=entry["output"],
+            file_name=f"history_{entry['id']}.txt",
+            key="history_download"
+        )
+
+@timed_fragment("History")
+def history_tab():
+    if is_demo:
+        st.info("🎮 **Demo Mode** - History is kept for real API keys only. Login with your API key to save results.")
+        return
+
+    ident = key_hash(api_key)
+    col_query, col_tab = st.columns([3, 1])
+    with col_query:
+        query = st.text_input(
+            "Search history",
+            placeholder="Search inputs, outputs and styles...",
+            key="history_query",
+            on_change=reset_history_pages
+        )
+    with col_tab:
+        tab_filter = st.selectbox("Tab", HISTORY_TABS, key="history_tab", on_change=reset_history_pages)
+    tab_name = None if tab_filter == HISTORY_TABS[0] else tab_filter
+
+    entry_id = st.session_state.get("history_open")
+    entry = studio.history.get(ident, entry_id) if entry_id else None
+    if entry:
+        render_history_entry(entry)
+
+    # Only the current page is read from disk; the cursors are the last id of each earlier page
+    cursors = st.session_state.setdefault("history_cursors", [])
+    entries = studio.history.page(ident, query, tab_name, cursors[-1] if cursors else None, HISTORY_PAGE_SIZE)
+    if not entries:
+        st.caption("No saved results match." if query or tab_name else "Results you generate are saved here.")
+        return
+    total = studio.history.count(ident, query, tab_name)
+    first = len(cursors) * HISTORY_PAGE_SIZE
+    st.caption(f"{first + 1}–{first + len(entries)} of {total}")
+
+    for item in entries:
+        with st.container(border=True):
+            col_text, col_open = st.columns([5, 1])
+            with col_text:
+                stamp = datetime.fromtimestamp(item["created"]).strftime("%Y-%m-%d %H:%M")
+                st.markdown(f"**{item['tab']}** · {item['style']} · {stamp}")
+                st.caption(item["input"])
+                st.text(item["output"] + ("…" if item["truncated"] else ""))
+            with col_open:
+                st.button("📄 Open", key=f"history_open_{item['id']}", on_click=open_history_entry, args=(item["id"],))
+
+    col_newer, col_older = st.columns(2)
+    with col_newer:
+        st.button("◀ Newer", key="history_newer", disabled=not cursors, on_click=cursors.pop,
+                  use_container_width=True)
+    with col_older:
+        st.button("Older ▶", key="history_older", disabled=first + len(entries) >= total,
+                  on_click=cursors.append, args=(entries[-1]["id"],), use_container_width=True)
+
+with tab6:
+    history_tab()
+
+# --- PERFORMANCE ---
+@timed_fragment("Performance")
+def performance_panel():
+    with st.expander("📊 Performance", expanded=False):
+        summary = studio.calls.summary(key_hash(api_key))
+        if not summary["calls"]:
+            st.caption("No API calls yet: latency, token and cost figures appear after the first generation.")
+            return
+        
+        col_a, col_b, col_c, col_d = st.columns(4)
+        col_a.metric("API calls", summary["calls"], f"{summary['errors']} failed", delta_color="off")
+        col_b.metric("Tokens / min", f"{summary['tokens_per_min']:,.0f}", help="Last 10 minutes")
+        col_c.metric("Est. cost", f"${summary['cost_usd']:.4f}", help="At list prices (studio.metrics.PRICES)")
+        col_d.metric("Calls avoided", studio.cache.near_hits,
+                     help="Near-duplicate requests answered from an earlier result (all sessions, since start)")
+        
+        st.dataframe([
+            {
+                "Tab": row["feature"],
+                "Calls": row["calls"],
+                "Errors": row["errors"],
+                "p50 (ms)": row["p50_ms"],
+                "p95 (ms)": row["p95_ms"],
+                "Retries": row["retries"],
+                "Tokens in": row["prompt_tokens"],
+                "Tokens out": row["output_tokens"],
+                "Est. cost ($)": round(row["cost_usd"], 4),
+            }
+            for row in summary["rows"]
+        ], hide_index=True, use_container_width=True)
+        st.caption(f"This key, since the app started · full call log: `{studio.calls.path}`")
+        st.button("🔄 Refresh", key="refresh_performance")
+
+performance_panel()
 
 # --- FOOTER ---
 st.markdown("<br><br>", unsafe_allow_html=True)
-st.markdown("""
-<div style='text-align: center; padding: 2rem; background: white; border-radius: 20px; 
-            margin: 0 3rem; box-shadow: 0 4px 20px rgba(0,0,0,0.08);'>
-    <h3 style='color: #667eea; margin-bottom: 0.5rem; font-family: "Manrope", sans-serif;'>
-        Ultra Studio V12 Pro
-    </h3>
-    <p style='color: #64748b; margin: 0;'>
-        Professional AI Content Creation Platform
-    </p>
-    <p style='color: #94a3b8; font-size: 0.9em; margin-top: 0.5rem;'>
-        Powered by Google Gemini AI ✨
-    </p>
+st.markdown(compact_html("""
+<div class="app-footer">
+    <h3>Ultra Studio V12 Pro</h3>
+    <p>Professional AI Content Creation Platform</p>
+    <p class="app-footer-note">Powered by Google Gemini AI ✨</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+"""), unsafe_allow_html=True)
+
+if is_debug():
+    timings = st.session_state.get("fragment_timings", {})
+    st.caption(
+        f"⏱️ Full rerun: {(time.perf_counter() - SCRIPT_STARTED) * 1000:.1f} ms · "
+        + " · ".join(f"{name}: {ms:.1f} ms" for name, ms in timings.items())
+    )
+
+rerun_span.end()
@@ -0,0 +1,14 @@
+"""Ultra Studio Pro content generators, usable without the Streamlit UI."""
+from .api import DEMO_KEY, Studio
+from .cache import ResponseCache
+from .clients import IMAGE_MODEL, TEXT_MODEL, ClientRegistry, GenerationError, key_hash
+from .dialogue import split_dialogue
+from .generators import CLIP_MODES, TextStream, stream_concurrently
+from .history import History
+from .imaging import ImageStore
+
+__all__ = [
+    "CLIP_MODES", "ClientRegistry", "DEMO_KEY", "GenerationError", "History", "IMAGE_MODEL", "ImageStore",
+    "ResponseCache", "Studio", "TEXT_MODEL", "TextStream", "key_hash", "split_dialogue",
+    "stream_concurrently",
+]
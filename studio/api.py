@@ -0,0 +1,176 @@
+"""Headless entry point to the five content generators.
+
+    from studio import Studio
+
+    studio = Studio()
+    text = studio.script_doctor(api_key, "my script", style="💼 Professional")
+
+One Studio per process is enough: it owns the pooled clients, the rate limiter,
+the circuit breaker, the response cache, the image store, the call log and the
+generation history, all of which are thread-safe. Pass DEMO_KEY (or no key) to get demo-mode placeholders.
+"""
+import json
+import os
+from pathlib import Path
+
+from .cache import ResponseCache
+from .clients import IMAGE_MODEL, ClientRegistry, GenerationError, key_hash, list_models
+from .dialogue import split_dialogue
+from .generators import (
+    ClipContext, TextStream, analyze_image, build_image_prompt, build_platform_prompt, build_script_prompt,
+    build_viral_prompt,
+    encoded_image_digests, generate_clips, generate_concurrently, generate_images, generate_text, style_label,
+)
+from .history import History
+from .imaging import ImageStore
+from .metrics import CallLog
+from .similarity import SimilarityIndex
+
+DEMO_KEY = "DEMO_MODE"
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    "ULTRA_STUDIO_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache"
+))
+
+class Studio:
+    """Script Doctor, Video Generator, AI Image Creator, Image Prompts and Viral Manager"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, registry=None):
+        cache_dir = Path(cache_dir)
+        self.registry = registry or ClientRegistry(calls=CallLog(cache_dir / "logs" / "calls.jsonl"))
+        self.calls = self.registry.calls
+        self.cache = ResponseCache(cache_dir / "responses.db", index=SimilarityIndex(cache_dir / "similarity.db"))
+        self.images = ImageStore(cache_dir / "images")
+        self.history = History(cache_dir / "history.db")
+
+    def model(self, api_key, feature="other"):
+        """Pooled text model for a key with calls attributed to feature, or None in demo mode"""
+        if not api_key or api_key == DEMO_KEY:
+            return None
+        return self.registry.text_model(api_key).for_feature(feature)
+
+    def check_key(self, api_key):
+        """Validate a key and return the models it can use (raises on failure)"""
+        return list_models(self.registry.client(api_key))
+
+    def _text(self, prompt, api_key, use_cache, stream, feature, text, options, similarity):
+        """Text generation for a tab; text is the user's free text and options the rest of the request
+
+        With use_cache and a similarity threshold, a response to an earlier
+        request from the same key with the same options and text at least that
+        alike is reused; the TextStream's .similarity says when that happened.
+        The default None never substitutes, it only indexes the response.
+        """
+        cache = self.cache if use_cache else None
+        model = self.model(api_key, feature)
+        similar = self._similar(api_key, model, feature, text, options, similarity)
+        if stream:
+            return TextStream(prompt, model, cache, similar)
+        return generate_text(prompt, model, cache, similar=similar)[0]
+
+    @staticmethod
+    def _similar(api_key, model, feature, text, options, similarity):
+        """(scope, text, threshold) for near-duplicate lookup: key and options must match exactly, text approximately"""
+        if model is None:
+            return None
+        # Per key: another user's response to a similar but different text could carry their details
+        scope = json.dumps([key_hash(api_key), model.model_name, feature, *options], ensure_ascii=False)
+        return scope, text, similarity
+
+    # --- Script Doctor ---
+    def script_doctor(self, api_key, script, style="🎯 Viral Hook", length="Keep Original",
+                      use_cache=True, stream=False, similarity=None):
+        """Rewritten script (or a TextStream when stream=True)"""
+        return self._text(build_script_prompt(script, style, length), api_key, use_cache, stream,
+                          "Script Doctor", script, (style, length), similarity)
+
+    def script_doctor_variants(self, api_key, script, variants, use_cache=True,
+                               similarity=None, max_workers=4):
+        """Rewrite script once per (style, length) in variants, in parallel
+
+        Yields (index, text or GenerationError, cached, seconds) as each variant finishes.
+        """
+        cache = self.cache if use_cache else None
+        model = self.model(api_key, "Script Doctor")
+        prompts = [build_script_prompt(script, style, length) for style, length in variants]
+        similar = [self._similar(api_key, model, "Script Doctor", script, variant, similarity) for variant in variants]
+        return generate_concurrently(prompts, model, cache, max_workers, similar)
+
+    # --- Video Generator ---
+    def analyze_character(self, api_key, image_bytes, use_cache=True):
+        """(description or GenerationError, stats) for a character image"""
+        return analyze_image(image_bytes, self.model(api_key, "Video Generator"), self.cache if use_cache else None)
+
+    def clip_context(self, api_key, character, visual_style, clip_count):
+        """Shared clip prefix for one run; use with `with` and read .report() at the end"""
+        return ClipContext(self.model(api_key, "Video Generator"), character, style_label(visual_style), clip_count)
+
+    def iter_clip_prompts(self, api_key, clips, character, visual_style="🎯 Strict Realism",
+                          mode="batched", max_workers=4, use_cache=True, context=None):
+        """Yield (index, prompt or GenerationError) for already split clips"""
+        return generate_clips(
+            clips, character, style_label(visual_style), self.model(api_key, "Video Generator"),
+            mode, self.cache if use_cache else None, max_workers, context,
+        )
+
+    def video_prompts(self, api_key, script, character, visual_style="🎯 Strict Realism",
+                      max_words=15, mode="batched", max_workers=4, use_cache=True):
+        """(clips, prompts, prefix token report) for a whole script, prompts in clip order"""
+        clips = split_dialogue(script, max_words)
+        prompts = [None] * len(clips)
+        with self.clip_context(api_key, character, visual_style, len(clips)) as context:
+            for i, result in self.iter_clip_prompts(api_key, clips, character, visual_style,
+                                                    mode, max_workers, use_cache, context):
+                prompts[i] = result
+        return clips, prompts, context.report()
+
+    # --- AI Image Creator ---
+    def create_images(self, api_key, prompt, number_of_images=1, seed=None, use_cache=True):
+        """(digests, error, cached) for an Imagen prompt; pixels live in self.images
+
+        Only seeded requests are repeatable, so only they reuse stored images;
+        without a seed every call asks for new ones.
+        """
+        if not api_key or api_key == DEMO_KEY:
+            # Imagen has no demo placeholder
+            return None, GenerationError("invalid_key", IMAGE_MODEL), False
+
+        key = self.images.make_key(IMAGE_MODEL, prompt, number_of_images, seed) if seed is not None else None
+        if use_cache and key is not None:
+            digests = self.images.lookup(key)
+            if digests:
+                return digests, None, True
+
+        images, error = generate_images(prompt, api_key, self.registry, number_of_images, seed)
+        if error:
+            return None, error, False
+        digests = encoded_image_digests(images, self.images)
+        if key is not None:
+            self.images.remember(key, digests)
+        return digests, None, False
+
+    # --- Image Prompts ---
+    def image_prompt(self, api_key, idea, style="🎯 Photorealistic", aspect="1:1 Square",
+                     detail="High Detail", use_cache=True, stream=False, similarity=None):
+        """Prompt text for external image generators (or a TextStream)"""
+        return self._text(build_image_prompt(idea, style, aspect, detail), api_key, use_cache, stream,
+                          "Image Prompts", idea, (style, aspect, detail), similarity)
+
+    # --- Viral Manager ---
+    def viral_strategy(self, api_key, topic, platforms=("YouTube",), audience="General Public",
+                       tone="Exciting/Energetic", use_cache=True, stream=False, similarity=None):
+        """Viral content package (or a TextStream)"""
+        # Platform order doesn't change the request
+        return self._text(build_viral_prompt(topic, platforms, audience, tone), api_key, use_cache, stream,
+                          "Viral Manager", topic, (sorted(platforms), audience, tone), similarity)
+
+    def viral_platform_streams(self, api_key, topic, platforms, audience="General Public",
+                               tone="Exciting/Energetic", use_cache=True, similarity=None):
+        """One TextStream per platform for the same topic; run them together with stream_concurrently"""
+        cache = self.cache if use_cache else None
+        model = self.model(api_key, "Viral Manager")
+        # A platform name (rather than viral_strategy's list) keeps these scopes apart from whole packages
+        return [
+            TextStream(build_platform_prompt(topic, platform, audience, tone), model, cache,
+                       self._similar(api_key, model, "Viral Manager", topic, (platform, audience, tone), similarity))
+            for platform in platforms
+        ]
@@ -0,0 +1,320 @@
+"""Run many generator jobs from a CSV or JSONL file.
+
+    python -m studio.batch jobs.csv -o results.jsonl --workers 4
+
+Each row is one job. The task is taken from a "task" column (viral, script,
+video or image-prompt) or inferred: a topic means Viral Manager, a script with
+a character means Video Generator, a script alone means Script Doctor.
+
+Columns per task (missing ones use the UI defaults):
+    viral         topic, platforms, audience, tone
+    script        script, style, length
+    video         script, character, visual_style, max_words, mode
+    image-prompt  idea, style, aspect, detail
+
+Results are appended to the output JSONL as they finish, one line per job.
+The output doubles as the checkpoint: rerunning the same command skips jobs
+already recorded as ok and retries the failed ones. Jobs are identified by an
+"id" column, or by a hash of the row when there is none.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from . import tracing
+from .api import DEFAULT_CACHE_DIR, Studio
+from .clients import GenerationError, estimate_tokens
+from .generators import build_image_prompt, build_script_prompt, build_viral_prompt
+
+TASKS = ("viral", "script", "video", "image-prompt")
+
+def read_jobs(path):
+    """Yield job dicts from a .csv or .jsonl/.ndjson file"""
+    path = Path(path)
+    with path.open(encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            for row in csv.DictReader(f):
+                # Blank cells mean "use the default"
+                yield {k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError(f"{path}:{line_no}: each line must be a JSON object")
+                    yield row
+
+def job_id(row):
+    """Explicit id column, or a stable hash of the row's contents"""
+    if row.get("id") not in (None, ""):
+        return str(row["id"])
+    raw = json.dumps(row, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def job_task(row):
+    task = row.get("task")
+    if task:
+        if task not in TASKS:
+            raise ValueError(f"unknown task '{task}' (expected one of {', '.join(TASKS)})")
+        return task
+    if row.get("topic"):
+        return "viral"
+    if row.get("script"):
+        return "video" if row.get("character") else "script"
+    if row.get("idea"):
+        return "image-prompt"
+    raise ValueError("can't tell the task: add a 'task' column or a topic/script/idea")
+
+def text(row, name, default=None):
+    """row[name] as a string; JSONL cells can hold any JSON type"""
+    value = row.get(name, default)
+    if value is None:
+        raise KeyError(name)
+    if not isinstance(value, str):
+        raise ValueError(f"'{name}' must be a string")
+    return value
+
+def as_list(value):
+    """Platforms come as a JSON list or a "YouTube; TikTok" style cell"""
+    if isinstance(value, list):
+        if not value or not all(isinstance(p, str) for p in value):
+            raise ValueError("'platforms' must be a non-empty list of strings")
+        return value
+    if not isinstance(value, str):
+        raise ValueError("'platforms' must be a list or a string")
+    return [p.strip() for p in value.replace("|", ";").replace(",", ";").split(";") if p.strip()]
+
+def pick(row, *names):
+    return {name: text(row, name) for name in names if row.get(name) not in (None, "")}
+
+def run_job(studio, api_key, row, use_cache, similarity=None):
+    """Run one job; returns (task, result, prompt_tokens, output_tokens, similarity)
+
+    result is JSON-ready on success or a GenerationError. Token counts are
+    estimates from prompt and output length. similarity is set when a text
+    job's result was an earlier near-duplicate request's (only with a threshold).
+    """
+    task = job_task(row)
+    if task == "viral":
+        opts = pick(row, "audience", "tone")
+        platforms = as_list(row.get("platforms", "YouTube"))
+        stream = studio.viral_strategy(api_key, text(row, "topic"), platforms, use_cache=use_cache, stream=True,
+                                       similarity=similarity, **opts)
+        prompt = build_viral_prompt(row["topic"], platforms, opts.get("audience", ""), opts.get("tone", ""))
+    elif task == "script":
+        opts = pick(row, "style", "length")
+        stream = studio.script_doctor(api_key, text(row, "script"), use_cache=use_cache, stream=True,
+                                      similarity=similarity, **opts)
+        prompt = build_script_prompt(row["script"], opts.get("style", ""), opts.get("length", ""))
+    elif task == "image-prompt":
+        opts = pick(row, "style", "aspect", "detail")
+        stream = studio.image_prompt(api_key, text(row, "idea"), use_cache=use_cache, stream=True,
+                                     similarity=similarity, **opts)
+        prompt = build_image_prompt(row["idea"], opts.get("style", ""), opts.get("aspect", ""), opts.get("detail", ""))
+    else:
+        opts = pick(row, "visual_style", "mode")
+        if "max_words" in row:
+            if isinstance(row["max_words"], bool) or not isinstance(row["max_words"], (int, str)):
+                raise ValueError("'max_words' must be an integer")
+            opts["max_words"] = int(row["max_words"])
+        clips, prompts, report = studio.video_prompts(
+            api_key, text(row, "script"), text(row, "character", ""), max_workers=1, use_cache=use_cache, **opts
+        )
+        errors = [p for p in prompts if isinstance(p, GenerationError)]
+        if errors:
+            return task, errors[0], 0, 0, None
+        result = [{"clip": i + 1, "dialogue": clip, "prompt": p} for i, (clip, p) in enumerate(zip(clips, prompts))]
+        # Shared prefix as actually sent, plus each clip's dialogue
+        in_tokens = report["sent_tokens"] + sum(estimate_tokens(c) for c in clips)
+        return task, result, in_tokens, sum(estimate_tokens(p) for p in prompts), None
+
+    result = stream.consume()
+    if isinstance(result, GenerationError):
+        return task, result, 0, 0, None
+    return task, result, estimate_tokens(prompt), estimate_tokens(result), stream.similarity
+
+def load_checkpoint(path):
+    """Ids of jobs already completed in an earlier run of the same output file"""
+    done = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted write; the job simply runs again
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+class BatchStats:
+    """Counters for the end-of-run summary (updated from the writer only)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.interrupted = False
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.failures = {}
+
+    def summary(self, cache=None, calls=None):
+        elapsed = time.perf_counter() - self.started
+        finished = self.ok + self.failed
+        lines = [
+            f"Jobs: {self.ok} ok, {self.failed} failed, {self.skipped} skipped (already done)",
+            f"Elapsed: {elapsed:.1f} s · {finished / elapsed * 60 if elapsed else 0:.1f} jobs/min",
+            f"Tokens (estimated): {self.prompt_tokens} in, {self.output_tokens} out"
+            f" · {(self.prompt_tokens + self.output_tokens) / elapsed * 60 if elapsed else 0:.0f}/min",
+        ]
+        if calls is not None:
+            upstream = calls.summary(since=self.started_at)
+            rows = upstream["rows"]
+            lines.append(
+                f"Upstream: {upstream['calls']} calls, {upstream['errors']} failed, "
+                f"{sum(r['retries'] for r in rows)} retries · "
+                f"{sum(r['prompt_tokens'] for r in rows)} in / {sum(r['output_tokens'] for r in rows)} out tokens"
+                f" · est. ${upstream['cost_usd']:.4f}"
+            )
+        if cache is not None:
+            lines.append(f"Response cache: {cache.hits} hits, {cache.misses} misses · "
+                         f"{cache.near_hits} calls avoided by near-duplicate reuse")
+        if self.failures:
+            lines.append("Failures: " + ", ".join(f"{kind} ×{n}" for kind, n in sorted(self.failures.items())))
+        return "\n".join(lines)
+
+def run_batch(jobs, output, studio, api_key, workers=4, use_cache=True, progress=None, similarity=None):
+    """Run jobs with at most `workers` in flight, appending results to output
+
+    Returns BatchStats. On Ctrl-C, queued jobs are dropped but the ones already
+    running are waited for and recorded, so nothing that was paid for is lost;
+    the next run picks up from there.
+    """
+    output = Path(output)
+    done = load_checkpoint(output)
+    stats = BatchStats()
+    lock = threading.Lock()
+
+    def record(out, entry):
+        with lock:
+            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            out.flush()
+
+    def execute(row):
+        started = time.perf_counter()
+        try:
+            with tracing.span("batch.job", id=job_id(row)):
+                task, result, in_tokens, out_tokens, match = run_job(studio, api_key, row, use_cache, similarity)
+        except (KeyError, ValueError) as e:
+            return {"task": row.get("task"), "result": GenerationError("bad_row", detail=f"bad row: {e}")}, 0, 0, started
+        except Exception as e:
+            # Record it against this job; the rest of the batch carries on
+            error = GenerationError("internal", detail=f"internal error: {type(e).__name__}: {e}")
+            return {"task": row.get("task"), "result": error}, 0, 0, started
+        return {"task": task, "result": result, "similarity": match}, in_tokens, out_tokens, started
+
+    with output.open("a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        rows = iter(jobs)
+
+        def finish(future):
+            ident, row = pending.pop(future)
+            outcome, in_tokens, out_tokens, started = future.result()
+            result = outcome["result"]
+            entry = {"id": ident, "task": outcome["task"], "input": row,
+                     "elapsed_ms": round((time.perf_counter() - started) * 1000)}
+            if isinstance(result, GenerationError):
+                entry.update(status="error", error={"kind": result.kind, "message": str(result)})
+                stats.failed += 1
+                stats.failures[result.kind] = stats.failures.get(result.kind, 0) + 1
+            else:
+                entry.update(status="ok", result=result)
+                if outcome.get("similarity") is not None:
+                    # Reused from an earlier request this similar, not generated for this row
+                    entry["similarity"] = outcome["similarity"]
+                stats.ok += 1
+                stats.prompt_tokens += in_tokens
+                stats.output_tokens += out_tokens
+            record(out, entry)
+            if progress:
+                progress(stats)
+
+        try:
+            for row in rows:
+                ident = job_id(row)
+                if ident in done:
+                    stats.skipped += 1
+                    continue
+                # Also skips duplicate rows within this file
+                done.add(ident)
+                # Keep the input lazy: only a small window of rows is in memory
+                while len(pending) >= workers * 2:
+                    completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        finish(future)
+                pending[pool.submit(execute, row)] = (ident, row)
+        except KeyboardInterrupt:
+            stats.interrupted = True
+            for future in list(pending):
+                if future.cancel():
+                    del pending[future]
+
+        while pending:
+            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                finish(future)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Run generator jobs from a CSV/JSONL file")
+    parser.add_argument("jobs", help="input .csv or .jsonl file")
+    parser.add_argument("-o", "--output", help="results JSONL (default: <jobs>.results.jsonl); also the checkpoint")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="jobs in flight at once")
+    parser.add_argument("--api-key", help="Gemini API key (default: $GEMINI_API_KEY or $GOOGLE_API_KEY)")
+    parser.add_argument("--no-cache", action="store_true", help="always make fresh API calls")
+    parser.add_argument("--similarity", type=float, default=0,
+                        help="reuse results of earlier requests at least this similar, e.g. 0.85 "
+                             "(default 0: off); reused results carry a similarity field")
+    parser.add_argument("--cache-dir", help="response/image cache directory")
+    args = parser.parse_args()
+
+    api_key = args.api_key or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        parser.error("no API key: pass --api-key or set GEMINI_API_KEY")
+
+    output = Path(args.output or Path(args.jobs).with_suffix(".results.jsonl"))
+    studio = Studio(args.cache_dir) if args.cache_dir else Studio()
+    tracing.configure_from_env(args.cache_dir or DEFAULT_CACHE_DIR)
+
+    def progress(stats):
+        print(f"\r{stats.ok} ok · {stats.failed} failed", end="", file=sys.stderr, flush=True)
+
+    try:
+        stats = run_batch(read_jobs(args.jobs), output, studio, api_key, args.workers,
+                          use_cache=not args.no_cache, progress=progress, similarity=args.similarity or None)
+    except KeyboardInterrupt:
+        # Second Ctrl-C while in-flight jobs were finishing
+        print(f"\nAborted; finished jobs are in {output}, rerun to resume.", file=sys.stderr)
+        sys.exit(130)
+    print(file=sys.stderr)
+    print(stats.summary(studio.cache, studio.calls))
+    print(f"Results: {output}")
+    if stats.interrupted:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+    sys.exit(1 if stats.failed else 0)
+
+if __name__ == "__main__":
+    main()
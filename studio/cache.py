@@ -0,0 +1,114 @@
+"""Two-tier response cache shared across sessions and restarts."""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of model responses, shared by all sessions
+    
+    With a similarity.SimilarityIndex, responses put with a (scope, text) can
+    also be found by get_similar() for near-identical requests.
+    """
+    
+    def __init__(self, path, memory_items=256, max_entries=5000, ttl=7 * 24 * 3600, index=None):
+        self.memory_items = memory_items
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.index = index
+        self.hits = 0
+        self.misses = 0
+        self.near_hits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._db.commit()
+    
+    @staticmethod
+    def make_key(model_name, prompt):
+        """Hash of model name plus whitespace-normalized prompt"""
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(f"{model_name}\n{normalized}".encode("utf-8")).hexdigest()
+    
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] < self.ttl:
+                self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                return row[0]
+            
+            self.misses += 1
+            return None
+    
+    def get_similar(self, scope, text, threshold):
+        """(value, similarity) of the closest earlier near-duplicate still cached, or (None, None)"""
+        if self.index is None:
+            return None, None
+        for similarity, key in self.index.find(scope, text, threshold):
+            value = self._peek(key)
+            if value is not None:
+                with self._lock:
+                    self.near_hits += 1
+                return value, similarity
+        return None, None
+    
+    def _peek(self, key):
+        """Value for key without touching hit/miss counts or recency"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                created = entry[1]
+                value = entry[0]
+            else:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                value, created = row
+        return value if time.time() - created < self.ttl else None
+    
+    def put(self, key, value, scope=None, text=None):
+        """Store a response; with scope and text it is also indexed for get_similar()"""
+        if self.index is not None and scope is not None:
+            self.index.add(scope, text, key)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            # Drop expired rows, then least recently used ones over the cap
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+    
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
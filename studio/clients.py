@@ -0,0 +1,481 @@
+"""Pooled Gemini/Imagen clients with rate limiting, retries and circuit breaking."""
+import copy
+import hashlib
+import random
+import re
+import threading
+import time
+
+from . import tracing
+from .sdk import genai_client, types
+
+TEXT_MODEL = 'gemini-3-flash-preview'
+IMAGE_MODEL = 'imagen-4.0-generate-001'
+
+def key_hash(api_key):
+    """Stable identifier for an API key that never exposes the key itself"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+# Per (API key, model) budgets, shared by every session in the process
+RATE_LIMITS = {
+    TEXT_MODEL: {"rpm": 60, "tpm": 1_000_000},
+    IMAGE_MODEL: {"rpm": 10, "tpm": None},
+}
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity per minute"""
+    
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+    
+    def wait_time(self, amount, now):
+        """Refill, then return 0 if amount is available or the seconds until it will be"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Oversized requests only need a full bucket, not more than it can hold
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+class RateLimiter:
+    """Requests/minute and tokens/minute buckets per (API key, model)"""
+    
+    def __init__(self, limits=RATE_LIMITS):
+        self.limits = limits
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, ident, model_name, tokens=0):
+        """Block until the request fits both budgets, then spend from them"""
+        while True:
+            with self._lock:
+                buckets = self._buckets_for(ident, model_name, tokens)
+                now = time.monotonic()
+                wait = 0.0
+                for bucket, amount in buckets:
+                    wait = max(wait, bucket.wait_time(amount, now))
+                if wait == 0:
+                    for bucket, amount in buckets:
+                        bucket.tokens -= min(amount, bucket.capacity)
+                    return
+            time.sleep(min(wait, 5.0))
+    
+    def _buckets_for(self, ident, model_name, tokens=0):
+        key = (ident, model_name)
+        if key not in self._buckets:
+            limits = self.limits.get(model_name, {})
+            rpm = TokenBucket(limits["rpm"]) if limits.get("rpm") else None
+            tpm = TokenBucket(limits["tpm"]) if limits.get("tpm") else None
+            self._buckets[key] = (rpm, tpm)
+        rpm, tpm = self._buckets[key]
+        return [(b, a) for b, a in ((rpm, 1), (tpm, tokens)) if b is not None]
+
+ERROR_MESSAGES = {
+    "rate_limit": "⏳ Rate limit reached even after retrying. Please try again in a minute.",
+    "quota": "💳 API quota exceeded. Check your quota at ai.google.dev",
+    "invalid_key": "🔑 Invalid API key.",
+    "invalid_request": "⚠️ {model} rejected the request (too long or malformed): {detail}",
+    "context_expired": "⏳ The shared clip context expired before the run finished. Please generate again.",
+    "not_found": "⚠️ Model '{model}' not found. Make sure it's enabled for your API key.",
+    "permission": "🚫 No permission to use {model}. Check API settings.",
+    "unavailable": "⚠️ {model} is not available in your region yet. Try again later.",
+    "empty": "⚠️ No output in response.",
+    "other": "⚠️ Error: {detail}",
+}
+
+class GenerationError:
+    """A failed generation: kind for branching, message for display, detail for debugging"""
+    
+    def __init__(self, kind, model="", detail=""):
+        self.kind = kind
+        self.model = model
+        self.detail = detail
+        self.message = ERROR_MESSAGES.get(kind, ERROR_MESSAGES["other"]).format(model=model, detail=detail)
+    
+    def __str__(self):
+        return self.message
+
+def error_kind(error_msg):
+    """Classify a raw API error message"""
+    lower = error_msg.lower()
+    # Daily limits name themselves in the metric or quotaId (..._per_day, ...PerDayPerProject...)
+    if re.search(r"per[ _]?day", lower):
+        return "quota"
+    if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg or "ResourceExhausted" in error_msg:
+        return "rate_limit"
+    if "quota" in lower:
+        return "quota"
+    if "API_KEY_INVALID" in error_msg or "api key not valid" in lower:
+        return "invalid_key"
+    # An expired or deleted context cache (cachedContents/...) says nothing about the model
+    if "cachedcontent" in lower or "cached content" in lower:
+        return "context_expired"
+    # Nor does a bad prompt or schema
+    if "INVALID_ARGUMENT" in error_msg:
+        return "invalid_request"
+    if "NOT_FOUND" in error_msg or "not found" in lower:
+        return "not_found"
+    if "PERMISSION_DENIED" in error_msg or "permission" in lower:
+        return "permission"
+    if "FAILED_PRECONDITION" in error_msg:
+        return "unavailable"
+    return "other"
+
+def is_rate_limited(error):
+    """True for 429 / RESOURCE_EXHAUSTED style failures worth retrying"""
+    # Daily quota is classified separately: it won't recover within a retry window
+    return error_kind(str(error)) == "rate_limit"
+
+def classify_error(exc, model_name=""):
+    """Turn a raw API exception into a GenerationError"""
+    if isinstance(exc, CircuitOpen):
+        return exc.error
+    return GenerationError(error_kind(str(exc)), model_name, str(exc))
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a (key, model) whose circuit is open"""
+    
+    def __init__(self, error, retry_at):
+        super().__init__(error.message)
+        self.error = error
+        self.retry_at = retry_at
+
+class CircuitBreaker:
+    """Per (API key, model) breaker for failures that retrying won't fix
+    
+    After `threshold` consecutive tripping failures the circuit opens and calls
+    fail fast with the last error. Once the cooldown passes, one probe call is let
+    through (half-open); success closes the circuit, failure reopens it with a
+    doubled cooldown.
+    """
+    
+    TRIP_KINDS = {"quota", "invalid_key", "not_found", "permission", "unavailable"}
+    
+    def __init__(self, threshold=2, cooldown=300, max_cooldown=3600):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._circuits = {}
+        self._lock = threading.Lock()
+    
+    def before_call(self, ident, model_name):
+        """Raise CircuitOpen unless the call may go ahead"""
+        with self._lock:
+            circuit = self._circuits.get((ident, model_name))
+            if circuit is None or circuit["state"] == "closed":
+                return
+            now = time.time()
+            if circuit["state"] == "open" and now >= circuit["retry_at"]:
+                circuit["state"] = "half_open"
+                circuit["probing"] = False
+            if circuit["state"] == "half_open" and not circuit["probing"]:
+                circuit["probing"] = True
+                return
+            raise CircuitOpen(circuit["error"], circuit["retry_at"])
+    
+    def release(self, ident, model_name):
+        """End a call that finished with no outcome (an abandoned stream), so the next may probe"""
+        with self._lock:
+            circuit = self._circuits.get((ident, model_name))
+            if circuit is not None:
+                circuit["probing"] = False
+    
+    def record_success(self, ident, model_name):
+        with self._lock:
+            self._circuits.pop((ident, model_name), None)
+    
+    def record_failure(self, ident, model_name, exc):
+        if isinstance(exc, CircuitOpen):
+            return
+        kind = error_kind(str(exc))
+        with self._lock:
+            circuit = self._circuits.setdefault(
+                (ident, model_name),
+                {"state": "closed", "failures": 0, "cooldown": self.cooldown, "probing": False}
+            )
+            circuit["probing"] = False
+            if kind not in self.TRIP_KINDS:
+                # Transient failures neither trip nor heal the circuit
+                if circuit["state"] == "closed":
+                    circuit["failures"] = 0
+                return
+            
+            circuit["failures"] += 1
+            circuit["error"] = GenerationError(kind, model_name, str(exc))
+            if circuit["state"] == "half_open":
+                circuit["cooldown"] = min(circuit["cooldown"] * 2, self.max_cooldown)
+            elif circuit["failures"] < self.threshold:
+                return
+            circuit["state"] = "open"
+            circuit["retry_at"] = time.time() + circuit["cooldown"]
+    
+    def states(self, ident):
+        """{model: (state, reason, retry_at)} for circuits that aren't closed"""
+        with self._lock:
+            return {
+                model_name: (c["state"], c["error"].message, c.get("retry_at", 0))
+                for (key, model_name), c in self._circuits.items()
+                if key == ident and c["state"] != "closed"
+            }
+
+def retry_delay(error, attempt, base=1.0, cap=60.0):
+    """Server-suggested retry delay if present, else jittered exponential backoff"""
+    match = re.search(r"retry(?:_?delay|Delay)?\W*(?:in\s*)?(\d+(?:\.\d+)?)\s*s", str(error), re.IGNORECASE)
+    if match:
+        return min(float(match.group(1)), cap)
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+def call_with_retries(fn, max_attempts=4):
+    """Run fn, retrying rate-limit errors with backoff"""
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_rate_limited(e):
+                raise
+            time.sleep(retry_delay(e, attempt))
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def estimate_request_tokens(contents):
+    """Token estimate for text or [text, image, ...] contents"""
+    if isinstance(contents, str):
+        return estimate_tokens(contents)
+    # Images are billed at a flat ~258 tokens
+    return sum(estimate_tokens(c) if isinstance(c, str) else 258 for c in contents)
+
+def usage_counts(response):
+    """(prompt, output, cached) token counts from a response's usage metadata, or Nones"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None, None
+    return (
+        getattr(usage, "prompt_token_count", None),
+        getattr(usage, "candidates_token_count", None),
+        getattr(usage, "cached_content_token_count", None),
+    )
+
+def outcome_of(exc):
+    """Call-log outcome for a failed call"""
+    return "circuit_open" if isinstance(exc, CircuitOpen) else error_kind(str(exc))
+
+class TextModel:
+    """GenerativeModel-style wrapper around a pooled google-genai client
+    
+    Every upstream call is recorded in the registry's call log, attributed to
+    self.feature (see for_feature).
+    """
+    
+    def __init__(self, client, model_name, ident, registry, feature="other"):
+        self.client = client
+        self.model_name = model_name
+        self.ident = ident
+        self.registry = registry
+        self.limiter = registry.limiter
+        self.breaker = registry.breaker
+        self.feature = feature
+    
+    def for_feature(self, feature):
+        """The same pooled model, with calls attributed to feature (a tab name)"""
+        model = copy.copy(self)
+        model.feature = feature
+        return model
+    
+    def generate_content(self, contents, stream=False, generation_config=None):
+        if stream:
+            return self._stream(contents, generation_config)
+        return self._generate(contents, generation_config)
+    
+    @tracing.traced("gemini.generate_content")
+    def _generate(self, contents, generation_config):
+        attempts = 0
+        def request():
+            nonlocal attempts
+            attempts += 1
+            self.limiter.acquire(self.ident, self.model_name, estimate_request_tokens(contents))
+            return self.client.models.generate_content(
+                model=self.model_name, contents=contents, config=generation_config
+            )
+        
+        started = time.perf_counter()
+        try:
+            self.breaker.before_call(self.ident, self.model_name)
+            response = call_with_retries(request)
+        except Exception as e:
+            if not isinstance(e, CircuitOpen):
+                self.breaker.record_failure(self.ident, self.model_name, e)
+            self._record("text", contents, started, attempts, outcome=outcome_of(e))
+            raise
+        self.breaker.record_success(self.ident, self.model_name)
+        self._record("text", contents, started, attempts, response=response)
+        return response
+    
+    def _record(self, kind, contents, started, attempts, outcome="ok", response=None, text=None, span=None):
+        calls = self.registry.calls
+        if calls is None:
+            return
+        prompt_tokens, output_tokens, cached_tokens = usage_counts(response)
+        estimated = False
+        if outcome == "ok" and prompt_tokens is None:
+            estimated = True
+            prompt_tokens = estimate_request_tokens(contents)
+            if text is None:
+                text = getattr(response, "text", None) or ""
+            output_tokens = estimate_tokens(text)
+        (span or tracing.current()).set(
+            model=self.model_name, feature=self.feature, retries=max(0, attempts - 1), outcome=outcome,
+            prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+        )
+        calls.record(
+            key=self.ident, model=self.model_name, feature=self.feature, kind=kind,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            retries=max(0, attempts - 1), outcome=outcome,
+            prompt_tokens=prompt_tokens, output_tokens=output_tokens, cached_tokens=cached_tokens,
+            estimated=estimated,
+        )
+    
+    def create_context_cache(self, system_instruction, ttl_seconds=600):
+        """Register a shared prompt prefix as cached content and return its name
+        
+        Deliberately outside the circuit breaker: callers fall back to sending the
+        prefix inline, so a failure here says nothing about the model itself.
+        """
+        started = time.perf_counter()
+        try:
+            with tracing.span("gemini.create_cache", model=self.model_name):
+                cached = self.client.caches.create(
+                    model=self.model_name,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=system_instruction,
+                        ttl=f"{ttl_seconds}s",
+                    )
+                )
+        except Exception as e:
+            self._record("cache", system_instruction, started, 1, outcome=outcome_of(e))
+            raise
+        # Creating the cache bills the prefix once as input
+        self._record("cache", system_instruction, started, 1, response=cached, text="")
+        return cached.name
+    
+    def extend_context_cache(self, name, ttl_seconds):
+        """Move cached content's expiry to ttl_seconds from now"""
+        with tracing.span("gemini.update_cache", model=self.model_name):
+            self.client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s"))
+    
+    def delete_context_cache(self, name):
+        """Drop cached content early; it would expire on its own after the TTL"""
+        try:
+            self.client.caches.delete(name=name)
+        except Exception:
+            pass
+    
+    def _stream(self, contents, generation_config, max_attempts=4):
+        # Held open across yields, so it must not become the consumer's parent span
+        span = tracing.span("gemini.stream", activate=False, model=self.model_name, feature=self.feature)
+        try:
+            yield from self._stream_chunks(contents, generation_config, max_attempts, span)
+        except Exception as e:
+            span.end(type(e).__name__)
+            raise
+        finally:
+            span.end()
+    
+    def _stream_chunks(self, contents, generation_config, max_attempts, span):
+        started = time.perf_counter()
+        try:
+            self.breaker.before_call(self.ident, self.model_name)
+        except CircuitOpen as e:
+            self._record("stream", contents, started, 0, outcome=outcome_of(e), span=span)
+            raise
+        # Retries are only safe before the first chunk has been handed out
+        for attempt in range(max_attempts):
+            streaming = False
+            texts = []
+            last = None
+            self.limiter.acquire(self.ident, self.model_name, estimate_request_tokens(contents))
+            try:
+                for chunk in self.client.models.generate_content_stream(
+                    model=self.model_name, contents=contents, config=generation_config
+                ):
+                    streaming = True
+                    texts.append(getattr(chunk, "text", None) or "")
+                    # Usage metadata arrives with the final chunk
+                    if getattr(chunk, "usage_metadata", None) is not None:
+                        last = chunk
+                    yield chunk
+                self.breaker.record_success(self.ident, self.model_name)
+                self._record("stream", contents, started, attempt + 1, response=last, text="".join(texts), span=span)
+                return
+            except GeneratorExit:
+                # The consumer stopped reading (e.g. a rerun): neither success nor failure
+                self.breaker.release(self.ident, self.model_name)
+                raise
+            except Exception as e:
+                if streaming or attempt == max_attempts - 1 or not is_rate_limited(e):
+                    self.breaker.record_failure(self.ident, self.model_name, e)
+                    self._record("stream", contents, started, attempt + 1, outcome=outcome_of(e), span=span)
+                    raise
+                time.sleep(retry_delay(e, attempt))
+
+def default_client(api_key):
+    return genai_client.Client(api_key=api_key)
+
+class ClientRegistry:
+    """One google-genai client per API key for the whole process
+    
+    Clients keep their HTTP connection pool alive across calls and reruns.
+    Keys that have not been used for idle_ttl seconds are closed and dropped.
+    Upstream calls are recorded in `calls` (a metrics.CallLog) when one is given.
+    client_factory(api_key) builds the clients; it defaults to google-genai's
+    Client and can be swapped for a stand-in backend (see benchmarks/).
+    """
+    
+    def __init__(self, limiter=None, breaker=None, idle_ttl=1800, calls=None, client_factory=None):
+        self.limiter = limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.idle_ttl = idle_ttl
+        self.calls = calls
+        self.client_factory = client_factory or default_client
+        self._clients = {}
+        self._lock = threading.Lock()
+    
+    def client(self, api_key):
+        with self._lock:
+            return self._entry(api_key)["client"]
+    
+    def text_model(self, api_key, model_name=TEXT_MODEL):
+        with self._lock:
+            entry = self._entry(api_key)
+            if model_name not in entry["models"]:
+                entry["models"][model_name] = TextModel(entry["client"], model_name, key_hash(api_key), self)
+            return entry["models"][model_name]
+    
+    def _entry(self, api_key):
+        now = time.time()
+        self._evict_idle(now)
+        ident = key_hash(api_key)
+        entry = self._clients.get(ident)
+        if entry is None:
+            entry = {"client": self.client_factory(api_key), "models": {}}
+            self._clients[ident] = entry
+        entry["last_used"] = now
+        return entry
+    
+    def _evict_idle(self, now):
+        for ident in [i for i, e in self._clients.items() if now - e["last_used"] > self.idle_ttl]:
+            close = getattr(self._clients.pop(ident)["client"], "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+
+def list_models(client):
+    """Model names a key can use; listing is free, so this doubles as key validation"""
+    return sorted(m.name.removeprefix("models/") for m in client.models.list())
@@ -0,0 +1,109 @@
+"""Dialogue segmentation into video clips."""
+import re
+
+from . import tracing
+
+# A run of sentence terminators plus any closing quotes/brackets. Latin-style runs
+# (. ! ? …) only end a sentence before whitespace or end of text, so "3.5" stays
+# intact; Indic danda and CJK/Arabic full stops need no following space.
+TERMINATOR_RUN = re.compile(r"[.!?…।॥。！？｡؟۔]+[\"'”’»」』）)\]]*")
+LATIN_TERMINATORS = frozenset(".!?…")
+CJK_CHAR = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+WORD_CHAR = re.compile(r"\w")
+
+def spoken_words(token):
+    """Word weight of a token; unspaced CJK text counts ~3 characters per word"""
+    cjk = len(CJK_CHAR.findall(token))
+    return max(1, -(-cjk // 3)) if cjk else 1
+
+def cut_unspaced(token, max_words):
+    """Cut a token into pieces of at most max_words spoken words, counting CJK by character"""
+    limit = max_words * 3
+    pieces = []
+    start = count = 0
+    for i, char in enumerate(token):
+        if CJK_CHAR.match(char):
+            if count == limit:
+                pieces.append(token[start:i])
+                start = i
+                count = 0
+            count += 1
+    pieces.append(token[start:])
+    return pieces
+
+def pack_words(words, max_words):
+    """Yield clips of at most max_words from one over-long sentence"""
+    chunk = []
+    weight = 0
+    for word in words:
+        pieces = cut_unspaced(word, max_words) if spoken_words(word) > max_words else (word,)
+        for piece in pieces:
+            piece_weight = spoken_words(piece)
+            if chunk and weight + piece_weight > max_words:
+                yield " ".join(chunk)
+                chunk = []
+                weight = 0
+            chunk.append(piece)
+            weight += piece_weight
+    if chunk:
+        yield " ".join(chunk)
+
+def sentence_ends(text):
+    """Yield the end offset of each sentence, always finishing with len(text)"""
+    length = len(text)
+    for m in TERMINATOR_RUN.finditer(text):
+        end = m.end()
+        if end < length and not text[end].isspace() and LATIN_TERMINATORS.issuperset(m.group().rstrip("\"'”’»)]")):
+            continue
+        yield end
+    yield length
+
+def iter_dialogue_clips(text, max_words=15):
+    """Yield clips of at most ~max_words, keeping sentences (and their punctuation) together"""
+    if not text:
+        return
+    
+    current = ""
+    word_count = 0
+    start = 0
+    for end in sentence_ends(text):
+        sentence = text[start:end]
+        start = end
+        words = sentence.split()
+        if not WORD_CHAR.search(sentence):
+            # Stray punctuation ("...") stays with its sentence but is never a clip
+            if words and current:
+                current += " " + " ".join(words)
+            continue
+        
+        # Sentences only get a space between them if the text had one (not in CJK)
+        joiner = " " if sentence[0].isspace() else ""
+        weight = len(words)
+        if CJK_CHAR.search(sentence):
+            weight = sum(spoken_words(w) for w in words)
+        if weight > max_words:
+            if current:
+                yield current
+                current = ""
+                word_count = 0
+            
+            yield from pack_words(words, max_words)
+        elif word_count + weight > max_words:
+            yield current
+            current = " ".join(words)
+            word_count = weight
+        else:
+            current = current + joiner + " ".join(words) if current else " ".join(words)
+            word_count += weight
+    
+    if current:
+        yield current
+
+def split_dialogue(text, max_words=15):
+    """Split dialogue into clips"""
+    if not text:
+        return []
+    with tracing.span("split_dialogue", chars=len(text)) as span:
+        clips = list(iter_dialogue_clips(text, max_words))
+        span.set(clips=len(clips))
+    return clips
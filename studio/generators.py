@@ -0,0 +1,750 @@
+"""Prompt builders and model calls behind the five content generators.
+
+Nothing here touches Streamlit: every function is safe to call from worker
+threads and returns text or a GenerationError for the caller to present. A
+model of None means demo mode.
+"""
+import hashlib
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .clients import (
+    IMAGE_MODEL, CircuitOpen, GenerationError, call_with_retries, classify_error,
+    estimate_tokens, key_hash, outcome_of,
+)
+from . import tracing
+from .imaging import encoded_image, load_for_analysis
+from .sdk import types
+
+log = logging.getLogger(__name__)
+
+DEMO_RESULT = "🎮 **Demo Mode Active**\n\nThis is a preview of what the AI would generate. To use real AI features, please:\n1. Logout\n2. Get a free API key from ai.google.dev\n3. Login with your API key\n\n[Sample output would appear here]"
+DEMO_ANALYSIS = "🎮 **Demo Mode** - Image analysis not available. Login with API key to use this feature."
+
+# --- Prompt Builders ---
+def build_script_prompt(script, style, length):
+    """Script Doctor rewrite request"""
+    return f"""Rewrite this script professionally:
+
+Style: {style}
+Length: {length}
+Input: {script}
+
+Requirements:
+- Maintain core message
+- Apply {style} style
+- {length}
+- Professional quality
+- Clear and engaging
+
+Output enhanced script only."""
+
+def style_label(option):
+    """Drop the leading emoji from a style option ("🎬 Cinematic Movie" -> "Cinematic Movie")"""
+    return option.split(" ", 1)[1] if " " in option else option
+
+def build_clip_prompt(index, clip, img_desc, style_name):
+    """Build the video prompt request for one clip"""
+    return f"""Create professional video prompt for AI tools.
+
+CLIP #{index+1}
+CHARACTER: {img_desc}
+DIALOGUE: "{clip}"
+STYLE: {style_name}
+
+Include:
+- Character description
+- Dialogue delivery
+- Facial expressions
+- Camera work
+- Lighting
+- Style elements
+
+Production-ready format."""
+
+CLIP_BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "clip": {"type": "INTEGER"},
+            "prompt": {"type": "STRING"},
+        },
+        "required": ["clip", "prompt"],
+    },
+}
+
+def plan_clip_batches(clips, output_token_budget=8192, tokens_per_clip=450, max_batch=25):
+    """Group clip indices so each batch's expected output fits the token budget"""
+    batches = []
+    current = []
+    used = 0
+    for i, clip in enumerate(clips):
+        # Each prompt comes back with the dialogue quoted plus the description
+        cost = tokens_per_clip + estimate_tokens(clip)
+        if current and (used + cost > output_token_budget or len(current) >= max_batch):
+            batches.append(current)
+            current = []
+            used = 0
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def build_batch_prompt(indices, clips, img_desc, style_name):
+    """Build one request covering several clips, sharing the character/style block"""
+    dialogue = "\n".join(f'CLIP #{i+1}: "{clips[i]}"' for i in indices)
+    return f"""Create professional video prompts for AI tools, one per clip.
+
+CHARACTER: {img_desc}
+STYLE: {style_name}
+
+{dialogue}
+
+For each clip include:
+- Character description
+- Dialogue delivery
+- Facial expressions
+- Camera work
+- Lighting
+- Style elements
+
+Production-ready format. Return one entry per clip with its clip number."""
+
+def build_clip_context(img_desc, style_name):
+    """Instructions, character and style shared by every clip of a run"""
+    return f"""Create professional video prompts for AI tools.
+
+CHARACTER: {img_desc}
+STYLE: {style_name}
+
+For each clip include:
+- Character description
+- Dialogue delivery
+- Facial expressions
+- Camera work
+- Lighting
+- Style elements
+
+Production-ready format."""
+
+def build_clip_message(index, clip):
+    """Per-clip request when the shared context is cached"""
+    return f'CLIP #{index+1}\nDIALOGUE: "{clip}"'
+
+def build_batch_message(indices, clips):
+    """Several clips in one request when the shared context is cached"""
+    dialogue = "\n".join(f'CLIP #{i+1}: "{clips[i]}"' for i in indices)
+    return f"{dialogue}\n\nReturn one entry per clip with its clip number."
+
+def build_image_generation_prompt(description, art_style="Photorealistic", quality="High Quality",
+                                  aspect_ratio="1:1 Square", mood="Natural", lighting="Natural", details=""):
+    """Imagen prompt for the AI Image Creator"""
+    prompt = f"{description}"
+
+    if art_style != "Photorealistic":
+        prompt += f", {art_style} style"
+
+    prompt += f", {aspect_ratio.split()[0]} aspect ratio"
+
+    if quality == "High Quality":
+        prompt += ", high quality, detailed"
+    elif quality == "Ultra HD 4K":
+        prompt += ", ultra HD 4K, extremely detailed, professional"
+
+    if mood != "Natural":
+        prompt += f", {mood.lower()} atmosphere"
+
+    if lighting != "Natural":
+        prompt += f", {lighting.lower()} lighting"
+
+    if details:
+        prompt += f", {details}"
+
+    return prompt
+
+def build_image_prompt(idea, style, aspect, detail):
+    """Image Prompts request (prompt text for Midjourney/DALL-E/Stable Diffusion)"""
+    return f"""Create professional image generation prompt:
+
+Vision: {idea}
+Style: {style}
+Aspect: {aspect}
+Detail: {detail}
+
+Include:
+- Main subject
+- Composition
+- Lighting
+- Color palette
+- Technical specs
+- Style keywords
+
+Format for Midjourney/DALL-E/Stable Diffusion"""
+
+def build_viral_prompt(topic, platforms, audience, tone):
+    """Viral Manager strategy request"""
+    return f"""Create viral content strategy:
+
+Topic: {topic}
+Platforms: {', '.join(platforms)}
+Audience: {audience}
+Tone: {tone}
+
+Generate:
+1. 5 Viral Titles
+2. SEO Description
+3. 30 Hashtags
+4. Call-to-Action options
+5. Hook Ideas
+6. Platform tips
+
+Professional format."""
+
+def build_platform_prompt(topic, platform, audience, tone):
+    """Viral Manager request for a single platform
+
+    The shared topic context comes first and the platform last, so the
+    per-platform requests of one package differ only in their tail.
+    """
+    return f"""Create viral content strategy:
+
+Topic: {topic}
+Audience: {audience}
+Tone: {tone}
+
+Platform: {platform}
+
+Generate for {platform} only, fitted to its formats, length limits and conventions:
+1. 5 Viral Titles
+2. SEO Description
+3. 30 Hashtags
+4. Call-to-Action options
+5. Hook Ideas
+6. Platform tips
+
+Professional format."""
+
+ANALYSIS_PROMPT = """Analyze this image for AI video generation. Describe:
+        1. Physical appearance (face, features, expressions)
+        2. Hair (style, color, length)
+        3. Clothing and accessories
+        4. Age range and gender
+        5. Overall style and vibe
+
+        Be specific and concise for AI prompts."""
+
+# --- Model Calls ---
+def cached_response(cache, key, similar):
+    """(text, similarity) from the cache: an exact hit (similarity None) or a near-duplicate"""
+    text = cache.get(key)
+    if text is not None or similar is None or not similar[2]:
+        return text, None
+    return cache.get_similar(*similar)
+
+def store_response(cache, key, text, similar):
+    if similar is None:
+        cache.put(key, text)
+    else:
+        cache.put(key, text, similar[0], similar[1])
+
+@tracing.traced("generate_text")
+def generate_text(prompt, model, cache=None, contents=None, generation_config=None, similar=None):
+    """Single text generation; returns (text or GenerationError, cached)
+
+    The response cache is keyed on prompt; contents, when given, is what is
+    actually sent (e.g. just the dialogue on top of cached context). Only
+    successful responses are cached. similar = (scope, text, threshold) also
+    indexes the response for near-duplicate reuse and, with a threshold,
+    returns an earlier near-identical request's response instead of calling.
+    """
+    if model is None:
+        return DEMO_RESULT, False
+
+    key = None
+    if cache is not None:
+        key = cache.make_key(model.model_name, prompt)
+        cached, similarity = cached_response(cache, key, similar)
+        if cached is not None:
+            tracing.current().set(cached=True, similarity=similarity)
+            return cached, True
+
+    try:
+        response = model.generate_content(contents or prompt, generation_config=generation_config)
+        text = response.text.strip()
+    except Exception as e:
+        return classify_error(e, model.model_name), False
+
+    if key is not None:
+        store_response(cache, key, text, similar)
+    return text, False
+
+class TextStream:
+    """Streaming text generation
+
+    Iterate to receive the text accumulated so far after each chunk; afterwards
+    .result holds the full text or a GenerationError, .cached says whether it
+    came from the cache, .similarity is set when that was a near-duplicate
+    request's response (see generate_text for similar) and .seconds is how
+    long it took.
+    """
+
+    def __init__(self, prompt, model, cache=None, similar=None):
+        self.prompt = prompt
+        self.model = model
+        self.cache = cache
+        self.similar = similar
+        self.result = None
+        self.cached = False
+        self.similarity = None
+        self.seconds = None
+
+    def __iter__(self):
+        span = tracing.span("stream_text")
+        start = time.perf_counter()
+        try:
+            yield from self._texts()
+        finally:
+            self.seconds = time.perf_counter() - start
+            span.set(cached=self.cached, similarity=self.similarity)
+            span.end()
+
+    def _texts(self):
+        if self.model is None:
+            self.result = DEMO_RESULT
+            return
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.model.model_name, self.prompt)
+            cached, similarity = cached_response(self.cache, key, self.similar)
+            if cached is not None:
+                self.result, self.cached, self.similarity = cached, True, similarity
+                return
+
+        chunks = []
+        try:
+            for chunk in self.model.generate_content(self.prompt, stream=True):
+                chunks.append(chunk.text or "")
+                yield "".join(chunks)
+        except Exception as e:
+            self.result = classify_error(e, self.model.model_name)
+            return
+
+        self.result = "".join(chunks).strip()
+        if key is not None:
+            store_response(self.cache, key, self.result, self.similar)
+
+    def consume(self):
+        """Run to completion without rendering and return the result"""
+        for _ in self:
+            pass
+        return self.result
+
+def stream_concurrently(streams, max_workers=4):
+    """Run TextStreams in parallel, yielding (index, text so far, done) on the calling thread
+
+    Partial texts arrive interleaved across streams; each stream's last event
+    has done=True (and text None), after which its .result is set.
+    """
+    events = queue.Queue()
+
+    def drive(index, stream):
+        try:
+            for text in stream:
+                events.put((index, text, False))
+        finally:
+            events.put((index, None, True))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i, stream in enumerate(streams):
+            tracing.submit(pool, drive, i, stream)
+        remaining = len(streams)
+        while remaining:
+            event = events.get()
+            remaining -= event[2]
+            yield event
+
+def timed_text(prompt, model, cache=None, similar=None):
+    """generate_text plus its wall time: (text or GenerationError, cached, seconds)"""
+    start = time.perf_counter()
+    result, cached = generate_text(prompt, model, cache, similar=similar)
+    return result, cached, time.perf_counter() - start
+
+def generate_concurrently(prompts, model, cache=None, max_workers=4, similar=None):
+    """Run independent prompts in parallel, yielding (index, result, cached, seconds) as each finishes
+
+    similar, when given, holds one (scope, text, threshold) per prompt (see generate_text).
+    """
+    if model is None:
+        for i in range(len(prompts)):
+            yield i, DEMO_RESULT, False, 0.0
+        return
+
+    similar = similar or [None] * len(prompts)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            tracing.submit(pool, timed_text, p, model, cache, s): i
+            for i, (p, s) in enumerate(zip(prompts, similar))
+        }
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+CONTEXT_CACHE_MIN_TOKENS = 1024  # smallest prefix the API accepts for explicit caching
+
+class ClipContext:
+    """The prefix (instructions, character, style) shared by every clip of a run
+
+    If the prefix is large enough for explicit context caching and the run has
+    more than one clip, it is registered once as cached content and each request
+    carries only its dialogue. Otherwise it is sent inline, and the generators
+    pack clips so it goes once per batch rather than once per clip. The cached
+    content is only created by the first request that actually goes upstream,
+    so a rerun served from the response cache creates none. Use as a context
+    manager so it is dropped when the run ends.
+
+    A long run (1,000 clips at 60 RPM takes ~17 minutes) outlives any fixed
+    TTL, so the cache is extended whenever less than half its TTL is left; if
+    it expires anyway, requests fall back to the inline prefix.
+    """
+
+    def __init__(self, model, img_desc, style_name, clip_count, ttl=600):
+        self.model = model
+        self.img_desc = img_desc
+        self.style_name = style_name
+        self.clip_count = clip_count
+        self.ttl = ttl
+        self.text = build_clip_context(img_desc, style_name)
+        self.tokens = estimate_tokens(self.text)
+        self.name = None
+        self.was_cached = False
+        self.unavailable = None
+        self.inline_sends = 0
+        self.cached_sends = 0
+        self._refresh_at = None
+        self._create = False
+        self._lock = threading.Lock()
+
+        if model is None or clip_count < 2:
+            return
+        if self.tokens < CONTEXT_CACHE_MIN_TOKENS:
+            self.unavailable = "prefix below the caching minimum"
+            return
+        self._create = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def cached(self):
+        return self.name is not None
+
+    def prepare(self):
+        """Create the cached content on the first upstream request, or extend it
+        once less than half of its TTL is left"""
+        with self._lock:
+            if self._create:
+                self._create = False
+                try:
+                    self.name = self.model.create_context_cache(self.text, self.ttl)
+                    self.was_cached = True
+                    self._refresh_at = time.monotonic() + self.ttl / 2
+                except Exception as e:
+                    # Unsupported model, real count under the minimum, storage quota...
+                    self.unavailable = str(e)
+                return
+            if self.name is None or time.monotonic() < self._refresh_at:
+                return
+            try:
+                self.model.extend_context_cache(self.name, self.ttl)
+                self._refresh_at = time.monotonic() + self.ttl / 2
+            except Exception:
+                # Try again shortly; if it lapses, requests fall back to the inline prefix
+                self._refresh_at = time.monotonic() + 30
+
+    def expire(self):
+        """The cached content is gone: send the prefix inline from now on"""
+        with self._lock:
+            if self.name is not None:
+                self.name = None
+                self.unavailable = "cached content expired during the run"
+
+    def clip_request(self, index, clip):
+        """(contents, generation_config) for a single clip about to be sent"""
+        self.prepare()
+        if self.cached:
+            return build_clip_message(index, clip), types.GenerateContentConfig(cached_content=self.name)
+        return build_clip_prompt(index, clip, self.img_desc, self.style_name), None
+
+    def batch_request(self, indices, clips):
+        """(contents, generation_config) for a structured multi-clip request about to be sent"""
+        self.prepare()
+        if self.cached:
+            return build_batch_message(indices, clips), types.GenerateContentConfig(
+                cached_content=self.name,
+                response_mime_type="application/json",
+                response_schema=CLIP_BATCH_SCHEMA,
+            )
+        return build_batch_prompt(indices, clips, self.img_desc, self.style_name), types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=CLIP_BATCH_SCHEMA,
+        )
+
+    def record_send(self):
+        """Count one request that went upstream with this prefix"""
+        with self._lock:
+            if self.cached:
+                self.cached_sends += 1
+            else:
+                self.inline_sends += 1
+
+    def report(self):
+        """Prefix token accounting for the run, against one inline prefix per clip"""
+        baseline = self.tokens * self.clip_count
+        # Creating the cache bills the prefix once; cached reads are billed at a discount
+        sent = self.tokens * (self.inline_sends + (1 if self.was_cached else 0))
+        return {
+            "prefix_tokens": self.tokens,
+            "cached": self.was_cached,
+            "unavailable": self.unavailable,
+            "requests": self.inline_sends + self.cached_sends,
+            "cached_reads": self.cached_sends,
+            "baseline_tokens": baseline,
+            "sent_tokens": sent,
+            "saved_tokens": max(0, baseline - sent),
+        }
+
+    def close(self):
+        with self._lock:
+            self._create = False
+        if self.name is not None:
+            self.model.delete_context_cache(self.name)
+            self.name = None
+
+def clip_cache_key(cache, index, clip, context):
+    """Response cache key of one clip, shared by per-clip and batched requests"""
+    return cache.make_key(context.model.model_name, build_clip_prompt(index, clip, context.img_desc, context.style_name))
+
+def generate_clip(index, clip, context, cache=None):
+    """One clip prompt through the shared context; returns the text or a GenerationError"""
+    prompt = build_clip_prompt(index, clip, context.img_desc, context.style_name)
+    key = None
+    if cache is not None:
+        # Looked up before the request is built, which may create the cached prefix
+        key = cache.make_key(context.model.model_name, prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            tracing.current().set(cached=True)
+            return cached
+    contents, config = context.clip_request(index, clip)
+    result, _ = generate_text(prompt, context.model, None, contents, config)
+    context.record_send()
+    if isinstance(result, GenerationError) and result.kind == "context_expired" and contents != prompt:
+        # Only a request through the cached prefix can hit an expired cache
+        context.expire()
+        return generate_clip(index, clip, context, cache)
+    if key is not None and not isinstance(result, GenerationError):
+        cache.put(key, result)
+    return result
+
+def call_clip_batch(indices, clips, context, cache=None):
+    """Generate a batch of clips in one request, returning {index: prompt}
+
+    Each returned clip is cached under its per-clip key, so a later run finds it
+    whichever mode it uses.
+    """
+    contents, config = context.batch_request(indices, clips)
+    context.record_send()
+    try:
+        response = context.model.generate_content(contents, generation_config=config)
+        entries = json.loads(response.text)
+    except Exception:
+        # Whole batch falls back to per-clip calls
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    wanted = set(indices)
+    results = {}
+    for entry in entries:
+        # Anything malformed is left to the per-clip fallback
+        if not isinstance(entry, dict) or not isinstance(entry.get("clip"), int) or isinstance(entry["clip"], bool):
+            continue
+        index = entry["clip"] - 1
+        text = str(entry.get("prompt", "")).strip()
+        if index in wanted and text:
+            results[index] = text
+            if cache is not None:
+                cache.put(clip_cache_key(cache, index, clips[index], context), text)
+    return results
+
+def generate_batched(clips, context, cache=None, max_workers=4, max_batch=25):
+    """Yield (index, result) for every clip, batching requests and retrying dropped clips
+
+    Clips already in the cache are yielded first; only the rest are batched.
+    """
+    pending = []
+    for i, clip in enumerate(clips):
+        cached = cache.get(clip_cache_key(cache, i, clip, context)) if cache is not None else None
+        if cached is not None:
+            yield i, cached
+        else:
+            pending.append(i)
+    if not pending:
+        return
+
+    missing = []
+    batches = [[pending[j] for j in batch]
+               for batch in plan_clip_batches([clips[i] for i in pending], max_batch=max_batch)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {tracing.submit(pool, call_clip_batch, batch, clips, context, cache): batch for batch in batches}
+        for future in as_completed(futures):
+            results = future.result()
+            for i in futures[future]:
+                if i in results:
+                    yield i, results[i]
+                else:
+                    missing.append(i)
+
+    if missing:
+        yield from generate_per_clip(missing, clips, context, cache, max_workers)
+
+def generate_per_clip(indices, clips, context, cache=None, max_workers=4):
+    """One request per clip in parallel, yielding (index, result) as each finishes"""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {tracing.submit(pool, generate_clip, i, clips[i], context, cache): i for i in indices}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+CLIP_MODES = ("batched", "grouped", "concurrent", "sequential")
+
+def generate_clips(clips, img_desc, style_name, model, mode="batched", cache=None, max_workers=4, context=None):
+    """Yield (index, result) for every clip using one of CLIP_MODES
+
+    Batched packs up to 25 clips per structured request; grouped spreads the
+    clips evenly over one batch per worker (within the same output budget), so
+    an uncached prefix goes about once per worker; concurrent sends one request
+    per clip. All three yield in completion order; sequential yields in order.
+    Pass a ClipContext to read its token report afterwards; otherwise one is
+    created (and its cached content dropped) for this run.
+    """
+    if model is None:
+        for i in range(len(clips)):
+            yield i, DEMO_RESULT
+        return
+
+    own_context = context is None
+    if own_context:
+        context = ClipContext(model, img_desc, style_name, len(clips))
+    try:
+        if mode == "sequential":
+            for i, clip in enumerate(clips):
+                yield i, generate_clip(i, clip, context, cache)
+        elif mode == "concurrent":
+            yield from generate_per_clip(range(len(clips)), clips, context, cache, max_workers)
+        elif mode == "grouped":
+            per_batch = math.ceil(len(clips) / max_workers)
+            yield from generate_batched(clips, context, cache, max_workers, max_batch=per_batch)
+        else:
+            yield from generate_batched(clips, context, cache, max_workers)
+    finally:
+        if own_context:
+            context.close()
+
+@tracing.traced("analyze_image")
+def analyze_image(data, model, cache=None):
+    """Describe a character image for video prompts
+
+    Returns (description or GenerationError, stats). Results are cached by the
+    image's content hash, so repeats skip both decoding and the API call.
+    """
+    if model is None:
+        return DEMO_ANALYSIS, None
+
+    started = time.perf_counter()
+    key = None
+    if cache is not None:
+        key = cache.make_key(model.model_name, f"image:{hashlib.sha256(data).hexdigest()}\n{ANALYSIS_PROMPT}")
+        cached = cache.get(key)
+        if cached is not None:
+            tracing.current().set(cached=True)
+            return cached, {"cached": True, "latency_ms": (time.perf_counter() - started) * 1000}
+
+    try:
+        img, stats = load_for_analysis(data)
+        response = model.generate_content([ANALYSIS_PROMPT, img])
+        text = response.text.strip()
+    except Exception as e:
+        return classify_error(e, model.model_name), None
+
+    if key is not None:
+        cache.put(key, text)
+    stats["cached"] = False
+    stats["latency_ms"] = (time.perf_counter() - started) * 1000
+    return text, stats
+
+def encoded_image_digests(images, store):
+    """Put generated images into an ImageStore and return their digests"""
+    return [store.put(*encoded_image(img)) for img in images]
+
+@tracing.traced("imagen.generate_images")
+def generate_images(prompt, api_key, registry, number_of_images=1, seed=None, feature="AI Image Creator"):
+    """Generate images using Imagen 4.0 model; returns (images, None) or (None, GenerationError)"""
+    ident = key_hash(api_key)
+    started = time.perf_counter()
+    attempts = 0
+
+    def record(outcome, images=0):
+        if registry.calls is not None:
+            registry.calls.record(
+                key=ident, model=IMAGE_MODEL, feature=feature, kind="image",
+                latency_ms=round((time.perf_counter() - started) * 1000, 1),
+                retries=max(0, attempts - 1), outcome=outcome, images=images,
+            )
+
+    try:
+        # Reuse the pooled client for this API key
+        client = registry.client(api_key)
+        registry.breaker.before_call(ident, IMAGE_MODEL)
+
+        def request():
+            nonlocal attempts
+            attempts += 1
+            # Wait for room in the shared per-key Imagen budget
+            registry.limiter.acquire(ident, IMAGE_MODEL)
+            return client.models.generate_images(
+                model=IMAGE_MODEL,
+                prompt=prompt,
+                config=types.GenerateImagesConfig(
+                    number_of_images=number_of_images,
+                    seed=seed,
+                )
+            )
+
+        response = call_with_retries(request)
+        registry.breaker.record_success(ident, IMAGE_MODEL)
+
+        # Extract all generated images
+        if response.generated_images and len(response.generated_images) > 0:
+            record("ok", len(response.generated_images))
+            return [img.image for img in response.generated_images], None
+
+        record("empty")
+        return None, GenerationError("empty", IMAGE_MODEL)
+
+    except Exception as e:
+        if not isinstance(e, CircuitOpen):
+            registry.breaker.record_failure(ident, IMAGE_MODEL, e)
+            # Not stdout: the service and batch CLI share this code
+            log.debug("Imagen request failed: %s", e)
+        record(outcome_of(e))
+        return None, classify_error(e, IMAGE_MODEL)
@@ -0,0 +1,121 @@
+"""Searchable history of generated results, kept on disk rather than in sessions."""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+PREVIEW_CHARS = 240
+
+def match_query(text):
+    """FTS5 query matching every word of text, the last one as a prefix (search as you type)"""
+    words = text.split()
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    # A one-letter prefix expands to most of the vocabulary; wait for a second letter
+    if len(words[-1]) > 1:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+class History:
+    """Inputs and outputs from every tab in SQLite, full-text indexed with FTS5
+
+    Entries belong to an API key (hash), so sessions only see their own. Pages
+    are fetched newest first with a keyset cursor (the last id of the previous
+    page), which stays fast however deep the history is; list pages carry
+    previews and get() loads a whole entry.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY, key TEXT, tab TEXT, style TEXT, created REAL,
+                input TEXT, output TEXT, meta TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entries_key ON entries(key, id);
+            CREATE INDEX IF NOT EXISTS entries_key_tab ON entries(key, tab, id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                input, output, style, content='entries', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            );
+            CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                INSERT INTO entries_fts(rowid, input, output, style) VALUES (new.id, new.input, new.output, new.style);
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                INSERT INTO entries_fts(entries_fts, rowid, input, output, style)
+                VALUES ('delete', old.id, old.input, old.output, old.style);
+            END;
+        """)
+        self._db.commit()
+
+    def add(self, key, tab, input_text, output, style="", meta=None):
+        """Record one result; returns its id"""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO entries (key, tab, style, created, input, output, meta) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, tab, style, time.time(), input_text, output, json.dumps(meta or {}, ensure_ascii=False))
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def _select(self, columns, key, query, tab, before=None):
+        """SELECT over this key's entries; searches walk the FTS index newest first so LIMIT stops early"""
+        match = match_query(query or "")
+        if match:
+            # CROSS JOIN keeps the FTS index as the outer loop rather than one MATCH per entry
+            sql = (f"SELECT {columns} FROM entries_fts f CROSS JOIN entries e ON e.id = f.rowid "
+                   f"WHERE entries_fts MATCH ? AND e.key = ?")
+            params = [match, key]
+            order = "f.rowid"
+        else:
+            sql = f"SELECT {columns} FROM entries e WHERE e.key = ?"
+            params = [key]
+            order = "e.id"
+        if tab:
+            sql += " AND e.tab = ?"
+            params.append(tab)
+        if before is not None:
+            sql += f" AND {order} < ?"
+            params.append(before)
+        return sql, params, order
+
+    def count(self, key, query="", tab=None):
+        sql, params, _ = self._select("COUNT(*)", key, query, tab)
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()[0]
+
+    def page(self, key, query="", tab=None, before=None, limit=20):
+        """Up to limit entries older than id `before`, newest first, with previews instead of full text"""
+        sql, params, order = self._select(
+            f"e.id, e.tab, e.style, e.created, substr(e.input, 1, {PREVIEW_CHARS}), "
+            f"substr(e.output, 1, {PREVIEW_CHARS}), length(e.output)",
+            key, query, tab, before,
+        )
+        with self._lock:
+            rows = self._db.execute(f"{sql} ORDER BY {order} DESC LIMIT ?", params + [limit]).fetchall()
+        return [
+            {"id": r[0], "tab": r[1], "style": r[2], "created": r[3], "input": r[4], "output": r[5],
+             "truncated": r[6] > PREVIEW_CHARS}
+            for r in rows
+        ]
+
+    def get(self, key, entry_id):
+        """A whole entry, or None if it isn't this key's"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, tab, style, created, input, output, meta FROM entries WHERE id = ? AND key = ?",
+                (entry_id, key)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "tab": row[1], "style": row[2], "created": row[3],
+                "input": row[4], "output": row[5], "meta": json.loads(row[6])}
+
+    def delete(self, key, entry_id):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE id = ? AND key = ?", (entry_id, key))
+            self._db.commit()
@@ -0,0 +1,199 @@
+"""Image decoding, encoding and the content-addressed image store."""
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import tracing
+from .sdk import Image
+
+class ImageStore:
+    """Content-addressed image blobs on disk, indexed in SQLite, capped by total size
+    
+    Blobs live at <root>/<digest[:2]>/<digest>.<ext> and are shared by identical
+    images. A separate table maps generation keys to the digests they produced.
+    When the store exceeds max_bytes, least recently used blobs are deleted.
+    """
+    
+    def __init__(self, root, max_bytes=500 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.root / "index.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "digest TEXT PRIMARY KEY, ext TEXT, size INTEGER, created REAL, accessed REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "key TEXT PRIMARY KEY, digests TEXT, created REAL)"
+        )
+        self._db.commit()
+    
+    @staticmethod
+    def make_key(model_name, prompt, number_of_images, seed=None):
+        raw = json.dumps([model_name, prompt, number_of_images, seed])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def put(self, data, ext="png"):
+        """Store encoded image bytes and return their digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        with self._lock:
+            path = self._path(digest, ext)
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(data)
+                tmp.replace(path)
+            self._db.execute(
+                "INSERT OR REPLACE INTO blobs (digest, ext, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (digest, ext, len(data), now, now)
+            )
+            self._db.commit()
+            self._collect_garbage()
+        return digest
+    
+    def load(self, digest):
+        """Encoded bytes for a digest, or None if it has been collected"""
+        with self._lock:
+            row = self._db.execute("SELECT ext FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE blobs SET accessed = ? WHERE digest = ?", (time.time(), digest))
+            self._db.commit()
+            try:
+                return self._path(digest, row[0]).read_bytes()
+            except FileNotFoundError:
+                self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                self._db.commit()
+                return None
+    
+    def extension(self, digest):
+        """File extension (png, webp, ...) of a stored blob, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT ext FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else None
+    
+    def lookup(self, key):
+        """Digests stored for a generation key, if every one of them is still present"""
+        with self._lock:
+            row = self._db.execute("SELECT digests FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            digests = json.loads(row[0])
+            placeholders = ",".join("?" * len(digests))
+            present = self._db.execute(
+                f"SELECT COUNT(*) FROM blobs WHERE digest IN ({placeholders})", digests
+            ).fetchone()[0]
+            if present < len(set(digests)):
+                self._db.execute("DELETE FROM generations WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                f"UPDATE blobs SET accessed = ? WHERE digest IN ({placeholders})", [time.time(), *digests]
+            )
+            self._db.commit()
+            return digests
+    
+    def remember(self, key, digests):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO generations (key, digests, created) VALUES (?, ?, ?)",
+                (key, json.dumps(digests), time.time())
+            )
+            self._db.commit()
+    
+    def _path(self, digest, ext):
+        return self.root / digest[:2] / f"{digest}.{ext}"
+    
+    def _collect_garbage(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for digest, ext, size in self._db.execute(
+            "SELECT digest, ext, size FROM blobs ORDER BY accessed"
+        ).fetchall():
+            self._path(digest, ext).unlink(missing_ok=True)
+            self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._db.commit()
+
+@tracing.traced("decode_image")
+def load_for_analysis(data, max_side=1024):
+    """Open image bytes at reduced resolution, returning (image, decode stats)
+    
+    JPEGs use draft mode, so the decoder itself scales by 1/2, 1/4 or 1/8 and a
+    phone photo is never decoded at full size. Other formats decode normally.
+    """
+    img = Image.open(io.BytesIO(data))
+    original_size = img.size
+    img.draft("RGB", (max_side, max_side))
+    img.load()
+    stats = {
+        "original_size": original_size,
+        "decoded_size": img.size,
+        # Largest pixel buffer held during analysis
+        "decoded_bytes": img.size[0] * img.size[1] * len(img.getbands()),
+    }
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return img, stats
+
+DOWNLOAD_FORMATS = {
+    "PNG": {"ext": "png", "mime": "image/png"},
+    "WebP (lossless)": {"ext": "webp", "mime": "image/webp"},
+    "JPEG": {"ext": "jpg", "mime": "image/jpeg"},
+}
+
+def to_pil(image):
+    """PIL image from a PIL image, encoded bytes, or a google-genai Image"""
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, bytes):
+        return Image.open(io.BytesIO(image))
+    return Image.open(io.BytesIO(image.image_bytes))
+
+def encoded_image(image):
+    """(bytes, extension) for storing an image without re-encoding when possible"""
+    data = getattr(image, "image_bytes", None)
+    if data:
+        mime = getattr(image, "mime_type", None) or "image/png"
+        return data, mime.split("/")[-1].replace("jpeg", "jpg")
+    buffer = io.BytesIO()
+    to_pil(image).save(buffer, format="PNG")
+    return buffer.getvalue(), "png"
+
+def encode_preview(image, max_side=768):
+    """Small WebP for on-screen display, keeping the websocket payload light"""
+    preview = to_pil(image).copy()
+    preview.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    preview.save(buffer, format="WEBP", quality=80, method=4)
+    return buffer.getvalue()
+
+def encode_download(image, fmt, level):
+    """Full-resolution encode; level is compression 0-9 for PNG/WebP, quality for JPEG"""
+    img = to_pil(image)
+    buffer = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buffer, format="PNG", compress_level=level)
+    elif fmt == "WebP (lossless)":
+        # For lossless WebP, quality is the compression effort
+        img.save(buffer, format="WEBP", lossless=True, quality=level * 11, method=min(6, level * 2 // 3))
+    else:
+        img.convert("RGB").save(buffer, format="JPEG", quality=level, optimize=True)
+    return buffer.getvalue()
+
+def encode_parallel(fn, images, *args, max_workers=4):
+    """Encode several images at once (Pillow's encoders release the GIL)"""
+    with tracing.span("encode_images", encoder=fn.__name__, count=len(images)):
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda img: fn(img, *args), images))
@@ -0,0 +1,130 @@
+"""Per-call latency, token and outcome accounting for upstream API calls."""
+import json
+import logging
+import logging.handlers
+import math
+import threading
+import time
+from collections import deque
+
+from .clients import IMAGE_MODEL, TEXT_MODEL
+
+# USD list prices per million tokens (text) or per image; update when pricing changes
+PRICES = {
+    TEXT_MODEL: {"input": 0.50, "output": 3.00, "cached": 0.05},
+    IMAGE_MODEL: {"image": 0.04},
+}
+
+def estimate_cost(record):
+    """Approximate USD cost of one call record at list prices"""
+    price = PRICES.get(record["model"])
+    if not price or record["outcome"] != "ok":
+        return 0.0
+    if "image" in price:
+        return price["image"] * record.get("images", 0)
+    cached = record.get("cached_tokens") or 0
+    fresh = max(0, (record.get("prompt_tokens") or 0) - cached)
+    return (
+        fresh * price["input"]
+        + cached * price.get("cached", price["input"])
+        + (record.get("output_tokens") or 0) * price["output"]
+    ) / 1e6
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+class CallLog:
+    """Records of upstream calls: recent ones in memory, all of them in a rotating JSONL file
+
+    Each record carries model, feature (the tab that made the call), kind,
+    prompt/output/cached token counts, latency, retries and outcome ("ok" or
+    the error kind). Token counts come from the response's usage metadata when
+    present and are estimated from text length otherwise ("estimated": true).
+    """
+
+    def __init__(self, path=None, keep=5000, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        self._records = deque(maxlen=keep)
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._logger = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._logger = logging.getLogger(f"studio.calls.{path}")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            if not self._logger.handlers:
+                handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self._logger.addHandler(handler)
+
+    def record(self, **fields):
+        fields.setdefault("ts", time.time())
+        with self._lock:
+            self._records.append(fields)
+            key = fields.get("key")
+            self._counts[key] = self._counts.get(key, 0) + 1
+        if self._logger is not None:
+            self._logger.info(json.dumps(fields, ensure_ascii=False))
+
+    def count(self, key):
+        """Upstream calls made with a key (hash) since the process started, failures included"""
+        return self._counts.get(key, 0)
+
+    def records(self, key=None, since=None):
+        with self._lock:
+            records = list(self._records)
+        return [
+            r for r in records
+            if (key is None or r.get("key") == key) and (since is None or r["ts"] >= since)
+        ]
+
+    def summary(self, key=None, since=None, rate_window=600):
+        """Per-feature rows plus totals for the performance panel
+
+        tokens_per_min covers the last rate_window seconds; everything else covers
+        all in-memory records (optionally since a timestamp).
+        """
+        records = self.records(key, since)
+        features = {}
+        for r in records:
+            features.setdefault(r.get("feature", "other"), []).append(r)
+
+        rows = []
+        for feature, calls in sorted(features.items()):
+            ok = [r for r in calls if r["outcome"] == "ok"]
+            latencies = [r["latency_ms"] for r in ok]
+            rows.append({
+                "feature": feature,
+                "calls": len(calls),
+                "errors": len(calls) - len(ok),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "retries": sum(r.get("retries", 0) for r in calls),
+                "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in ok),
+                "output_tokens": sum(r.get("output_tokens") or 0 for r in ok),
+                "cost_usd": sum(estimate_cost(r) for r in ok),
+            })
+
+        now = time.time()
+        recent = [r for r in records if r["ts"] >= now - rate_window and r["outcome"] == "ok"]
+        if recent:
+            # Measure from the first call when the window isn't full yet
+            span = max(60.0, now - min(r["ts"] for r in recent))
+            recent_tokens = sum((r.get("prompt_tokens") or 0) + (r.get("output_tokens") or 0) for r in recent)
+            tokens_per_min = recent_tokens / span * 60
+        else:
+            tokens_per_min = 0.0
+        return {
+            "rows": rows,
+            "calls": len(records),
+            "errors": sum(row["errors"] for row in rows),
+            "tokens_per_min": tokens_per_min,
+            "cost_usd": sum(row["cost_usd"] for row in rows),
+        }
@@ -0,0 +1,24 @@
+"""Lazily imported third-party SDKs.
+
+The Gemini SDK and Pillow dominate cold start, so they are only imported when a
+feature first touches them.
+"""
+import importlib
+
+class LazyModule:
+    """Module proxy that imports on first attribute access"""
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+genai_client = LazyModule("google.genai")
+types = LazyModule("google.genai.types")
+Image = LazyModule("PIL.Image")
+
+HEAVY_MODULES = ["google.genai", "google.genai.types", "PIL.Image"]
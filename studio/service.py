@@ -0,0 +1,274 @@
+"""JSON-over-HTTP front end for Studio.
+
+    python -m studio.service --port 8600
+
+Every POST takes a JSON body and the caller's Gemini key in X-Api-Key (or
+"Authorization: Bearer <key>"); requests without a key are rejected with 401.
+Each request runs on its own thread, so slow model calls don't block others;
+the shared rate limiter keeps concurrent requests within each key's budget.
+
+Text endpoints only reuse a near-duplicate earlier result when the body sets
+"similarity" (a threshold between 0 and 1); the response's "similarity" is
+then the match's score, and null when the text was generated for this request.
+"""
+import argparse
+import base64
+import json
+import re
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import tracing
+from .api import DEFAULT_CACHE_DIR, Studio
+from .clients import GenerationError
+from .generators import CLIP_MODES
+
+ERROR_STATUS = {
+    "rate_limit": 429,
+    "quota": 429,
+    "invalid_key": 401,
+    "invalid_request": 400,
+    "permission": 403,
+    "not_found": 404,
+    "unavailable": 503,
+}
+
+IMAGE_PATH = re.compile(r"^/v1/images/([0-9a-f]{64})$")
+MAX_BODY = 20 * 1024 * 1024
+
+class BadRequest(Exception):
+    pass
+
+# Expected JSON type of each optional field, with allowed ranges and choices
+OPTION_TYPES = {
+    "style": str, "length": str, "visual_style": str, "mode": str, "aspect": str, "detail": str,
+    "audience": str, "tone": str, "character": str, "platforms": list,
+    "use_cache": bool, "max_words": int, "max_workers": int, "number_of_images": int, "seed": int,
+    "similarity": float,
+}
+TYPE_NAMES = {str: "a string", list: "a non-empty list of strings", bool: "true or false",
+              int: "an integer", float: "a number"}
+NULLABLE = {"seed", "similarity"}
+RANGES = {"max_words": (1, 100), "max_workers": (1, 16), "number_of_images": (1, 4), "similarity": (0, 1)}
+CHOICES = {"mode": CLIP_MODES}
+
+def has_type(value, expected):
+    if expected is list:
+        return isinstance(value, list) and bool(value) and all(isinstance(v, str) for v in value)
+    if expected in (int, float):
+        # JSON true/false are Python ints too
+        return isinstance(value, (int, float) if expected is float else int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+def check(name, value):
+    """Raise BadRequest unless value suits the optional field name"""
+    if value is None and name in NULLABLE:
+        return value
+    expected = OPTION_TYPES[name]
+    if not has_type(value, expected):
+        raise BadRequest(f"'{name}' must be {TYPE_NAMES[expected]}")
+    if name in RANGES:
+        low, high = RANGES[name]
+        if not low <= value <= high:
+            raise BadRequest(f"'{name}' must be between {low} and {high}")
+    if name in CHOICES and value not in CHOICES[name]:
+        raise BadRequest(f"'{name}' must be one of {', '.join(CHOICES[name])}")
+    return value
+
+def field(data, name):
+    """A required non-empty string"""
+    value = data.get(name)
+    if value is None or value == "":
+        raise BadRequest(f"'{name}' is required")
+    if not isinstance(value, str):
+        raise BadRequest(f"'{name}' must be a string")
+    return value
+
+def options(data, *names):
+    return {name: check(name, data[name]) for name in names if name in data}
+
+def error_body(error):
+    return {"error": {"kind": error.kind, "message": str(error)}}
+
+def text_payload(name, stream):
+    """Run a TextStream to the end; similarity is set when an earlier near-duplicate's result was returned"""
+    return {name: stream.consume(), "similarity": stream.similarity}
+
+# --- Endpoints ---
+# Each takes (studio, api_key, body) and returns a JSON payload or a GenerationError
+def script_doctor(studio, api_key, data):
+    return text_payload("script", studio.script_doctor(
+        api_key, field(data, "script"), stream=True, **options(data, "style", "length", "use_cache", "similarity"),
+    ))
+
+def video_prompts(studio, api_key, data):
+    clips, prompts, report = studio.video_prompts(
+        api_key, field(data, "script"), check("character", data.get("character", "")),
+        **options(data, "visual_style", "max_words", "mode", "max_workers", "use_cache"),
+    )
+    if prompts and all(isinstance(p, GenerationError) for p in prompts):
+        return prompts[0]
+    return {
+        "clips": [
+            {"clip": i + 1, "dialogue": clip, "prompt": None if isinstance(p, GenerationError) else p,
+             "error": p.kind if isinstance(p, GenerationError) else None}
+            for i, (clip, p) in enumerate(zip(clips, prompts))
+        ],
+        "prefix": report,
+    }
+
+def create_images(studio, api_key, data):
+    digests, error, cached = studio.create_images(
+        api_key, field(data, "prompt"), **options(data, "number_of_images", "seed", "use_cache"),
+    )
+    if error is not None:
+        return error
+    return {"cached": cached, "images": [{"digest": d, "url": f"/v1/images/{d}"} for d in digests]}
+
+def image_prompts(studio, api_key, data):
+    return text_payload("prompt", studio.image_prompt(
+        api_key, field(data, "idea"), stream=True, **options(data, "style", "aspect", "detail", "use_cache", "similarity"),
+    ))
+
+def viral(studio, api_key, data):
+    return text_payload("strategy", studio.viral_strategy(
+        api_key, field(data, "topic"), stream=True, **options(data, "platforms", "audience", "tone", "use_cache", "similarity"),
+    ))
+
+def analyze_character(studio, api_key, data):
+    try:
+        image = base64.b64decode(field(data, "image"), validate=True)
+    except ValueError:
+        raise BadRequest("'image' must be base64")
+    description, stats = studio.analyze_character(api_key, image, **options(data, "use_cache"))
+    return {"description": description, "stats": stats}
+
+ROUTES = {
+    "/v1/script-doctor": script_doctor,
+    "/v1/video-prompts": video_prompts,
+    "/v1/images": create_images,
+    "/v1/image-prompts": image_prompts,
+    "/v1/viral": viral,
+    "/v1/analyze-character": analyze_character,
+}
+
+class StudioHandler(BaseHTTPRequestHandler):
+    studio = None
+    protocol_version = "HTTP/1.1"
+
+    def api_key(self):
+        key = self.headers.get("X-Api-Key")
+        if not key:
+            auth = self.headers.get("Authorization", "")
+            if auth.startswith("Bearer "):
+                key = auth[len("Bearer "):]
+        return key.strip() if key else None
+
+    def read_body(self):
+        """The raw body, or None when its length is unusable and it is left unread"""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return None
+        if length < 0 or length > MAX_BODY:
+            return None
+        return self.rfile.read(length)
+
+    def read_json(self, body):
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise BadRequest("body must be JSON")
+        if not isinstance(data, dict):
+            raise BadRequest("body must be a JSON object")
+        return data
+
+    def send(self, status, body, content_type="application/json", headers=()):
+        if content_type == "application/json":
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reject(self, status, kind, message):
+        """Error reply before the body is read; on keep-alive the unread body would
+        be parsed as the next request, so the connection is closed instead"""
+        self.close_connection = True
+        self.send(status, {"error": {"kind": kind, "message": message}}, headers=[("Connection", "close")])
+
+    def do_POST(self):
+        endpoint = ROUTES.get(self.path)
+        if endpoint is None:
+            self.reject(404, "not_found", "unknown endpoint")
+            return
+        api_key = self.api_key()
+        if not api_key:
+            # Demo placeholders would pass for real output in a pipeline
+            self.reject(401, "missing_key", "pass a Gemini API key in X-Api-Key or Authorization: Bearer")
+            return
+        body = self.read_body()
+        if body is None:
+            self.reject(400, "bad_request", f"Content-Length must be an integer between 0 and {MAX_BODY}")
+            return
+        try:
+            with tracing.span(f"POST {self.path}"):
+                result = endpoint(self.studio, api_key, self.read_json(body))
+        except BadRequest as e:
+            self.send(400, {"error": {"kind": "bad_request", "message": str(e)}})
+            return
+        except Exception:
+            self.log_error("%s failed:\n%s", self.path, traceback.format_exc())
+            self.send(500, {"error": {"kind": "internal", "message": "internal error"}})
+            return
+
+        # Text endpoints return the error in place of the text
+        if isinstance(result, dict):
+            error = next((v for v in result.values() if isinstance(v, GenerationError)), None)
+        else:
+            error, result = result, None
+        if error is not None:
+            self.send(ERROR_STATUS.get(error.kind, 502), error_body(error))
+        else:
+            self.send(200, result)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self.send(200, {"ok": True})
+            return
+        match = IMAGE_PATH.match(self.path)
+        data = self.studio.images.load(match.group(1)) if match else None
+        if data is None:
+            self.send(404, {"error": {"kind": "not_found", "message": "not found"}})
+            return
+        ext = self.studio.images.extension(match.group(1)) or "png"
+        # Blobs are content-addressed, so they never change
+        self.send(200, data, f"image/{ext.replace('jpg', 'jpeg')}",
+                  [("Cache-Control", "public, max-age=31536000, immutable")])
+
+def make_server(host="127.0.0.1", port=8600, studio=None):
+    """HTTP server bound to one Studio (call serve_forever() to run it)"""
+    handler = type("BoundStudioHandler", (StudioHandler,), {"studio": studio or Studio()})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the content generators over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+
+    tracing.configure_from_env(DEFAULT_CACHE_DIR)
+    server = make_server(args.host, args.port)
+    print(f"Studio API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
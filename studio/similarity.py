@@ -0,0 +1,164 @@
+"""Near-duplicate detection for requests, with MinHash signatures and LSH banding."""
+import functools
+import hashlib
+import re
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+
+NEAR_DUPLICATE_THRESHOLD = 0.85
+SIGNATURE_VERSION = 2  # bump when signatures change; older indexes are dropped
+
+NON_WORD = re.compile(r"[\W_]+")
+
+def normalize(text):
+    """Casefolded words separated by single spaces, so whitespace and punctuation edits don't count"""
+    return " ".join(NON_WORD.sub(" ", text.casefold()).split())
+
+def shingles(text, k=5):
+    """Character k-grams of the normalized text"""
+    text = normalize(text)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+@functools.lru_cache(maxsize=256)
+def minhash(text, num_perm=64):
+    """One-permutation MinHash of text's shingles, or None for empty text
+
+    Each shingle is hashed once to 64 bits: the low bits pick one of num_perm
+    bins and the rest is its value, and each bin keeps its minimum. That is
+    linear in the text, where num_perm separate hash functions would cost
+    num_perm passes. Empty bins (short texts) borrow the next non-empty bin's
+    value plus an offset per step, so both sides of a comparison fill them the
+    same way. Memoized: a request's text is looked up and then indexed, and
+    compare runs reuse one text across several scopes.
+    """
+    width = (1 << 64) // num_perm
+    empty = 1 << 64
+    bins = [empty] * num_perm
+    for shingle in shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        index, value = h % num_perm, h // num_perm
+        if value < bins[index]:
+            bins[index] = value
+    if all(b == empty for b in bins):
+        return None
+    signature = []
+    for i in range(num_perm):
+        step = 0
+        while bins[(i + step) % num_perm] == empty:
+            step += 1
+        signature.append(bins[(i + step) % num_perm] + step * width)
+    return tuple(signature)
+
+class SimilarityIndex:
+    """MinHash signatures of earlier requests, looked up by LSH bands in SQLite
+
+    Each entry has a scope (the parts of a request that must match exactly,
+    such as model, tab and options), the free text that may vary, and a ref
+    (the response cache key of its result). find() lists the earlier entries
+    in the same scope whose estimated Jaccard similarity of character
+    shingles reaches the threshold.
+    """
+
+    def __init__(self, path, num_perm=64, bands=16, max_entries=20000):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self._format = f"<{num_perm}Q"
+        self._adds = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SIGNATURE_VERSION:
+            # Signatures from another scheme aren't comparable; it is only a cache
+            self._db.executescript(f"""
+                DROP TABLE IF EXISTS signatures;
+                DROP TABLE IF EXISTS buckets;
+                DROP TABLE IF EXISTS bands;
+                PRAGMA user_version = {SIGNATURE_VERSION};
+            """)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                id INTEGER PRIMARY KEY, scope TEXT, ref TEXT, signature BLOB, created REAL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER, id INTEGER);
+            CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets(bucket);
+            CREATE INDEX IF NOT EXISTS buckets_id ON buckets(id);
+            CREATE INDEX IF NOT EXISTS signatures_ref ON signatures(ref, scope);
+        """)
+        self._db.commit()
+
+    def signature(self, text):
+        """MinHash signature of text's shingles, or None for empty text"""
+        return minhash(text, self.num_perm)
+
+    def _buckets(self, scope, signature):
+        """One LSH bucket per band: a hash of the scope, the band number and its rows of the signature"""
+        packed = struct.pack(self._format, *signature)
+        size = self.rows * 8
+        prefix = scope.encode("utf-8") + b"\0"
+        return [
+            int.from_bytes(
+                hashlib.blake2b(prefix + bytes([band]) + packed[band * size:(band + 1) * size], digest_size=8).digest(),
+                "big", signed=True,
+            )
+            for band in range(self.bands)
+        ]
+
+    def add(self, scope, text, ref):
+        signature = self.signature(text)
+        if signature is None:
+            return
+        with self._lock:
+            # A regenerated result replaces the cached value under the same ref
+            if self._db.execute("SELECT 1 FROM signatures WHERE ref = ? AND scope = ?", (ref, scope)).fetchone():
+                return
+            cursor = self._db.execute(
+                "INSERT INTO signatures (scope, ref, signature, created) VALUES (?, ?, ?, ?)",
+                (scope, ref, struct.pack(self._format, *signature), time.time())
+            )
+            self._db.executemany(
+                "INSERT INTO buckets (bucket, id) VALUES (?, ?)",
+                [(bucket, cursor.lastrowid) for bucket in self._buckets(scope, signature)]
+            )
+            self._adds += 1
+            if self._adds % 100 == 0:
+                self._prune()
+            self._db.commit()
+
+    def find(self, scope, text, threshold=NEAR_DUPLICATE_THRESHOLD):
+        """[(similarity, ref)] for earlier entries at or above threshold, most similar first"""
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        buckets = self._buckets(scope, signature)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT ref, signature FROM signatures WHERE id IN ("
+                f"SELECT id FROM buckets WHERE bucket IN ({', '.join('?' * len(buckets))}))",
+                buckets
+            ).fetchall()
+
+        matches = []
+        for ref, packed in rows:
+            other = struct.unpack(self._format, packed)
+            similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+            if similarity >= threshold:
+                matches.append((similarity, ref))
+        return sorted(matches, reverse=True)
+
+    def _prune(self):
+        """Drop the oldest entries over max_entries"""
+        self._db.execute(
+            "DELETE FROM signatures WHERE id IN ("
+            "SELECT id FROM signatures ORDER BY id DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._db.execute("DELETE FROM buckets WHERE id < (SELECT MIN(id) FROM signatures)")
@@ -0,0 +1,196 @@
+"""Optional tracing: nested timing spans sent to a pluggable exporter.
+
+    with tracing.span("split_dialogue", words=120):
+        ...
+
+Tracing is off until an exporter is set; until then span() returns a shared
+no-op object, so instrumented code pays one global lookup per span. Turn it on
+with set_exporter(...) or the ULTRA_STUDIO_TRACE environment variable:
+
+    ULTRA_STUDIO_TRACE=console          indented tree on stderr
+    ULTRA_STUDIO_TRACE=file             .cache/traces.jsonl
+    ULTRA_STUDIO_TRACE=/path/to.jsonl   JSONL at that path
+
+An exporter is any object with export(span); spans arrive as they finish, so
+children come before their parent.
+"""
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from pathlib import Path
+
+_exporter = None
+_current = contextvars.ContextVar("studio_span", default=None)
+
+class Span:
+    """One timed operation; parent/child links follow the current context"""
+
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "depth",
+                 "start", "duration_ms", "error", "_started", "_token")
+
+    def __init__(self, name, attributes, parent=None, activate=True):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent.span_id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.start = time.time()
+        self.duration_ms = None
+        self.error = None
+        self._started = time.perf_counter()
+        self._token = _current.set(self) if activate else None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.error = error
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # Ended from another context (e.g. an abandoned generator being collected)
+                pass
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc_type.__name__ if exc_type else None)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+class NoopSpan:
+    """Stands in for Span while tracing is off"""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+NOOP = NoopSpan()
+
+def span(name, activate=True, **attributes):
+    """Child of the current span (or a new trace); use as a context manager
+
+    activate=False keeps it from becoming the parent of spans started while it
+    is open, for spans held across generator yields.
+    """
+    if _exporter is None:
+        return NOOP
+    return Span(name, attributes, _current.get(), activate)
+
+def current():
+    """The open span in this context, for adding attributes (a no-op when tracing is off)"""
+    if _exporter is None:
+        return NOOP
+    return _current.get() or NOOP
+
+def begin(name, **attributes):
+    """Start a root span and make it current; finish it with .end()
+
+    For scopes that can't be a with block, such as a whole Streamlit rerun. A
+    root that was never ended (the run was cut short) is simply replaced.
+    """
+    if _exporter is None:
+        return NOOP
+    return Span(name, attributes)
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return fn(*args, **kwargs)
+            with Span(name, {}, _current.get()):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def submit(pool, fn, *args):
+    """pool.submit that keeps the caller's current span as the parent in the worker"""
+    if _exporter is None:
+        return pool.submit(fn, *args)
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+# --- Exporters ---
+class ConsoleExporter:
+    """Writes each finished span as an indented line"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        attrs = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        error = f" ! {span.error}" if span.error else ""
+        with self._lock:
+            print(f"[trace {span.trace_id}] {'  ' * span.depth}{span.name} {span.duration_ms:.1f} ms {attrs}{error}",
+                  file=self.stream, flush=True)
+
+class JsonlExporter:
+    """Appends each finished span as a JSON line"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+def set_exporter(exporter):
+    """Enable tracing with exporter, or disable it with None"""
+    global _exporter
+    _exporter = exporter
+
+def enabled():
+    return _exporter is not None
+
+def configure_from_env(default_dir):
+    """Set the exporter from ULTRA_STUDIO_TRACE (see module docstring); returns it"""
+    target = os.environ.get("ULTRA_STUDIO_TRACE", "").strip()
+    if not target or target == "0":
+        return None
+    if target == "console":
+        exporter = ConsoleExporter()
+    elif target in ("1", "file"):
+        exporter = JsonlExporter(Path(default_dir) / "traces.jsonl")
+    else:
+        exporter = JsonlExporter(target)
+    set_exporter(exporter)
+    return exporter
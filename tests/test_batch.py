@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from fake_backend import FakeBackend
+from studio import ClientRegistry, Studio
+from studio.batch import load_checkpoint, run_batch
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+@pytest.fixture
+def studio(tmp_path, backend):
+    return Studio(tmp_path / "cache", registry=ClientRegistry(client_factory=backend.client))
+
+def run(studio, tmp_path, jobs):
+    output = tmp_path / "results.jsonl"
+    stats = run_batch(jobs, output, studio, "AIzaTEST", workers=2)
+    return stats, {e["id"]: e for e in map(json.loads, output.read_text().splitlines())}
+
+def test_bad_rows_are_recorded_without_calling_the_model(studio, backend, tmp_path):
+    jobs = [
+        {"id": "ok", "topic": "coffee", "platforms": ["YouTube"]},
+        {"id": "number", "topic": 42},
+        {"id": "list", "script": ["Hello."]},
+        {"id": "option", "script": "Hello.", "style": {"name": "Funny"}},
+        {"id": "platforms", "topic": "tea", "platforms": [1, 2]},
+        {"id": "words", "script": "Hi.", "character": "a man", "max_words": 2.5},
+        {"id": "unknown", "name": "x"},
+    ]
+    stats, entries = run(studio, tmp_path, jobs)
+    assert (stats.ok, stats.failed) == (1, 6)
+    assert entries["ok"]["status"] == "ok"
+    assert entries["number"]["error"]["message"] == "⚠️ Error: bad row: 'topic' must be a string"
+    assert all(entries[i]["error"]["kind"] == "bad_row" for i in entries if i != "ok")
+    assert backend.counts["stream"] == 1
+
+def test_unexpected_errors_fail_only_their_job(studio, tmp_path, monkeypatch):
+    def boom(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(Studio, "image_prompt", boom)
+    jobs = [{"id": "a", "idea": "a cat"}, {"id": "b", "script": "Hello there."}]
+    stats, entries = run(studio, tmp_path, jobs)
+    assert (stats.ok, stats.failed) == (1, 1)
+    assert entries["a"]["error"]["kind"] == "internal"
+    assert "RuntimeError: boom" in entries["a"]["error"]["message"]
+    assert entries["b"]["status"] == "ok"
+    assert load_checkpoint(tmp_path / "results.jsonl") == {"b"}
+
+def test_rerun_skips_finished_jobs(studio, backend, tmp_path):
+    jobs = [{"id": "a", "script": "Hello there."}, {"id": "b", "idea": "a cat"}]
+    run(studio, tmp_path, jobs)
+    stats, _ = run(studio, tmp_path, jobs)
+    assert (stats.ok, stats.skipped) == (0, 2)
+    assert backend.counts["stream"] == 2
@@ -0,0 +1,88 @@
+import pytest
+
+from fake_backend import FakeBackend
+from studio.clients import CircuitBreaker, CircuitOpen, ClientRegistry, error_kind
+
+@pytest.mark.parametrize("message, kind", [
+    ("400 INVALID_ARGUMENT. API key not valid. Please pass a valid API key. [reason: API_KEY_INVALID]", "invalid_key"),
+    ("400 INVALID_ARGUMENT. The input token count (1200000) exceeds the maximum number of tokens allowed", "invalid_request"),
+    ("400 INVALID_ARGUMENT. Invalid JSON payload received. Unknown name \"schema\"", "invalid_request"),
+    ("404 NOT_FOUND. CachedContent not found (or permission denied)", "context_expired"),
+    ("403 PERMISSION_DENIED. Permission denied on resource cachedContents/abc123", "context_expired"),
+    ("404 NOT_FOUND. models/gemini-x is not found for API version v1beta", "not_found"),
+    ("429 RESOURCE_EXHAUSTED. Please retry in 3s", "rate_limit"),
+    ("429 RESOURCE_EXHAUSTED. Quota exceeded for metric generate_requests_per_day", "quota"),
+    ("429 RESOURCE_EXHAUSTED. {'error': {'code': 429, 'message': 'You exceeded your current quota', "
+     "'details': [{'violations': [{'quotaMetric': 'generativelanguage.googleapis.com/generate_content_free_tier_requests', "
+     "'quotaId': 'GenerateRequestsPerDayPerProjectPerModel-FreeTier'}]}]}}", "quota"),
+    ("429 RESOURCE_EXHAUSTED. quotaId: GenerateRequestsPerMinutePerProjectPerModel-FreeTier", "rate_limit"),
+    ("Quota exceeded: requests per day", "quota"),
+    ("403 PERMISSION_DENIED. Caller does not have permission", "permission"),
+    ("400 FAILED_PRECONDITION. User location is not supported", "unavailable"),
+    ("500 INTERNAL. An internal error has occurred", "other"),
+])
+def test_error_kind(message, kind):
+    assert error_kind(message) == kind
+
+def test_breaker_opens_after_threshold_tripping_failures():
+    breaker = CircuitBreaker(threshold=2)
+    error = Exception("API key not valid [API_KEY_INVALID]")
+    breaker.record_failure("k", "m", error)
+    breaker.before_call("k", "m")
+    breaker.record_failure("k", "m", error)
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.before_call("k", "m")
+    assert raised.value.error.kind == "invalid_key"
+    # Other keys and models are unaffected
+    breaker.before_call("k", "other")
+    breaker.before_call("other", "m")
+
+@pytest.mark.parametrize("message", [
+    "400 INVALID_ARGUMENT. The input token count exceeds the maximum number of tokens allowed",
+    "404 NOT_FOUND. CachedContent not found (or permission denied)",
+    "429 RESOURCE_EXHAUSTED. Please retry in 3s",
+])
+def test_breaker_ignores_request_level_failures(message):
+    breaker = CircuitBreaker(threshold=2)
+    for _ in range(5):
+        breaker.record_failure("k", "m", Exception(message))
+    breaker.before_call("k", "m")
+    assert breaker.states("k") == {}
+
+def test_breaker_half_open_probe(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("studio.clients.time.time", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, cooldown=10)
+    error = Exception("403 PERMISSION_DENIED. Caller does not have permission")
+    breaker.record_failure("k", "m", error)
+    with pytest.raises(CircuitOpen):
+        breaker.before_call("k", "m")
+
+    now[0] += 11
+    breaker.before_call("k", "m")  # the probe goes through
+    with pytest.raises(CircuitOpen):
+        breaker.before_call("k", "m")  # but only one at a time
+    breaker.record_failure("k", "m", error)
+    assert breaker.states("k")["m"][2] == now[0] + 20  # cooldown doubled
+
+    now[0] += 21
+    breaker.before_call("k", "m")
+    breaker.record_success("k", "m")
+    breaker.before_call("k", "m")
+    assert breaker.states("k") == {}
+
+def test_abandoned_stream_probe_releases_the_circuit(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("studio.clients.time.time", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, cooldown=10)
+    registry = ClientRegistry(breaker=breaker, client_factory=FakeBackend().client)
+    model = registry.text_model("AIzaTEST")
+    breaker.record_failure(model.ident, model.model_name, Exception("403 PERMISSION_DENIED. Caller does not have permission"))
+
+    now[0] += 11
+    probe = model.generate_content("hello there friend", stream=True)
+    next(probe)
+    probe.close()  # a rerun abandons the stream mid-way
+    # The next call is let through as a new probe, and its success closes the circuit
+    assert "".join(chunk.text for chunk in model.generate_content("hello", stream=True))
+    assert breaker.states(model.ident) == {}
@@ -0,0 +1,48 @@
+import pytest
+
+from studio.dialogue import spoken_words, split_dialogue
+
+def weight(clip):
+    return sum(spoken_words(w) for w in clip.split())
+
+@pytest.mark.parametrize("text", [None, "", "   \n ", "...", " ?! … "])
+def test_empty_input(text):
+    assert split_dialogue(text) == []
+
+def test_sentences_are_packed_and_keep_punctuation():
+    text = "Hello there. How are you? I am fine! Thanks for asking."
+    assert split_dialogue(text, max_words=5) == ["Hello there. How are you?", "I am fine!", "Thanks for asking."]
+
+def test_decimals_and_trailing_quotes_stay_in_the_sentence():
+    text = 'It costs 3.5 dollars. She said "wow." Then left.'
+    assert split_dialogue(text, max_words=4) == ["It costs 3.5 dollars.", 'She said "wow."', "Then left."]
+
+def test_long_sentence_is_split_by_word_count():
+    text = " ".join(f"w{i}" for i in range(20)) + "."
+    clips = split_dialogue(text, max_words=8)
+    assert [len(c.split()) for c in clips] == [8, 8, 4]
+    assert " ".join(clips) == text
+
+def test_indic_and_cjk_terminators():
+    assert split_dialogue("नमस्ते दोस्तों। आप कैसे हैं॥ ठीक", max_words=3) == ["नमस्ते दोस्तों।", "आप कैसे हैं॥", "ठीक"]
+    assert split_dialogue("你好。我很好！谢谢", max_words=1) == ["你好。", "我很好！", "谢谢"]
+
+def test_unspaced_sentences_are_joined_without_a_space():
+    assert split_dialogue("今日は晴れ。明日は雨！") == ["今日は晴れ。明日は雨！"]
+    assert split_dialogue("今日は晴れ。 Then rain.") == ["今日は晴れ。 Then rain."]
+
+def test_stray_punctuation_stays_with_the_clip():
+    assert split_dialogue("Wait. ... What?") == ["Wait. ... What?"]
+
+def test_long_unspaced_cjk_sentence_is_split_by_characters():
+    sentence = "今天天气非常好我们一起去公园散步然后在湖边吃午饭再去看一场电影晚上回家做饭休息一下明天继"
+    clips = split_dialogue(sentence + "。", max_words=8)
+    assert len(clips) == 2
+    assert "".join(clips) == sentence + "。"
+    assert all(weight(c) <= 8 for c in clips)
+
+def test_mixed_long_sentence_respects_the_limit():
+    text = "Today " + "我们一起去公园散步" * 6 + " and then more words here"
+    clips = split_dialogue(text, max_words=5)
+    assert all(weight(c) <= 5 for c in clips)
+    assert "".join(clips).replace(" ", "") == text.replace(" ", "")
@@ -0,0 +1,111 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from studio.cache import ResponseCache
+from studio.generators import ClipContext, generate_clips
+
+class ContextModel:
+    """Stands in for TextModel: answers clip requests and tracks cached content"""
+
+    model_name = "fake-model"
+
+    def __init__(self, expired=False):
+        self.expired = expired
+        self.requests = []
+        self.created = 0
+        self.extended = []
+
+    def create_context_cache(self, text, ttl):
+        self.created += 1
+        return "cachedContents/run"
+
+    def extend_context_cache(self, name, ttl):
+        self.extended.append((name, ttl))
+
+    def delete_context_cache(self, name):
+        pass
+
+    def generate_content(self, contents, generation_config=None):
+        cached = getattr(generation_config, "cached_content", None)
+        self.requests.append(cached)
+        if cached and self.expired:
+            raise Exception("404 NOT_FOUND. CachedContent not found (or permission denied)")
+        return SimpleNamespace(text=f"prompt for {contents[:20]}")
+
+LONG_CHARACTER = "tall " * 3000
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("studio.generators.time.monotonic", lambda: now[0])
+    return now
+
+def test_cached_content_is_extended_before_it_expires(clock):
+    model = ContextModel()
+    context = ClipContext(model, LONG_CHARACTER, "Cinematic", clip_count=10, ttl=600)
+    assert not context.cached
+
+    context.clip_request(0, "hi")
+    assert context.cached
+    assert model.extended == []
+    clock[0] += 301
+    context.clip_request(1, "hi")
+    context.clip_request(2, "hi")
+    assert model.extended == [("cachedContents/run", 600)]
+
+def test_expired_cache_falls_back_to_inline_prefix():
+    model = ContextModel(expired=True)
+    clips = ["One.", "Two.", "Three."]
+    with ClipContext(model, LONG_CHARACTER, "Cinematic", len(clips)) as context:
+        results = dict(generate_clips(clips, LONG_CHARACTER, "Cinematic", model, "sequential", context=context))
+        assert not context.cached
+    assert all(r.startswith("prompt for") for r in results.values())
+    # One failed cached request, then every clip inline
+    assert model.requests == ["cachedContents/run", None, None, None]
+
+@pytest.mark.parametrize("mode", ["batched", "sequential"])
+def test_cached_rerun_creates_no_cached_content(tmp_path, mode):
+    cache = ResponseCache(tmp_path / "responses.db")
+    clips = ["One.", "Two.", "Three."]
+    model = ContextModel()
+    with ClipContext(model, LONG_CHARACTER, "Cinematic", len(clips)) as context:
+        first = dict(generate_clips(clips, LONG_CHARACTER, "Cinematic", model, "sequential", cache, context=context))
+    assert model.created == 1
+
+    model = ContextModel()
+    with ClipContext(model, LONG_CHARACTER, "Cinematic", len(clips)) as context:
+        again = dict(generate_clips(clips, LONG_CHARACTER, "Cinematic", model, mode, cache, context=context))
+        assert context.report()["requests"] == 0
+    assert again == first
+    assert (model.created, model.requests) == (0, [])
+
+def test_concurrent_mode_sends_one_request_per_clip():
+    model = ContextModel()
+    clips = [f"Line {i}." for i in range(12)]
+    results = dict(generate_clips(clips, "a man", "Cinematic", model, "concurrent", max_workers=4))
+    assert sorted(results) == list(range(12))
+    assert len(model.requests) == 12
+
+class BatchModel(ContextModel):
+    """Answers batch requests with a JSON list that has malformed clip numbers"""
+
+    def generate_content(self, contents, generation_config=None):
+        if getattr(generation_config, "response_mime_type", None) == "application/json":
+            self.requests.append("batch")
+            return SimpleNamespace(text=json.dumps([
+                {"clip": 1, "prompt": "batched one"},
+                {"clip": None, "prompt": "no number"},
+                {"clip": "2", "prompt": "string number"},
+                {"clip": True, "prompt": "bool number"},
+            ]))
+        return super().generate_content(contents, generation_config)
+
+def test_malformed_batch_entries_fall_back_to_per_clip():
+    model = BatchModel()
+    clips = ["One.", "Two.", "Three."]
+    results = dict(generate_clips(clips, "a man", "Cinematic", model, "batched"))
+    assert results[0] == "batched one"
+    assert results[1].startswith("prompt for") and results[2].startswith("prompt for")
+    assert model.requests == ["batch", None, None]
@@ -0,0 +1,15 @@
+import pytest
+
+from studio.metrics import percentile
+
+@pytest.mark.parametrize("values, pct, expected", [
+    (list(range(1, 11)), 50, 5),
+    (list(range(1, 21)), 95, 19),
+    (list(range(1, 21)), 100, 20),
+    (list(range(1, 101)), 99, 99),
+    ([3, 1, 2], 0, 1),
+    ([7], 95, 7),
+    ([], 50, None),
+])
+def test_nearest_rank(values, pct, expected):
+    assert percentile(values, pct) == expected
@@ -0,0 +1,98 @@
+import http.client
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from fake_backend import FakeBackend
+from studio import ClientRegistry, Studio
+from studio.service import make_server
+
+@pytest.fixture
+def post(tmp_path):
+    backend = FakeBackend()
+    studio = Studio(tmp_path, registry=ClientRegistry(client_factory=backend.client))
+    server = make_server("127.0.0.1", 0, studio)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def post(path, body, key="AIzaTEST"):
+        request = urllib.request.Request(base + path, data=json.dumps(body).encode(),
+                                         headers={"X-Api-Key": key} if key else {})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    post.port = server.server_address[1]
+    yield post
+    server.shutdown()
+    server.server_close()
+
+def test_missing_key_is_rejected(post):
+    status, body = post("/v1/script-doctor", {"script": "hello"}, key=None)
+    assert status == 401
+    assert body["error"]["kind"] == "missing_key"
+
+def test_text_endpoint(post):
+    status, body = post("/v1/script-doctor", {"script": "hello world", "style": "😂 Funny"})
+    assert status == 200
+    assert body["script"]
+    assert body["similarity"] is None
+
+def test_near_duplicate_reuse_is_reported(post):
+    script = "The quick brown fox jumps over the lazy dog and keeps running far away " * 20
+    post("/v1/script-doctor", {"script": script, "similarity": 0.85})
+    status, body = post("/v1/script-doctor", {"script": script + " Fin.", "similarity": 0.85})
+    assert status == 200
+    assert body["similarity"] >= 0.85
+
+@pytest.mark.parametrize("path, body, message", [
+    ("/v1/script-doctor", {}, "'script' is required"),
+    ("/v1/script-doctor", {"script": 123}, "'script' must be a string"),
+    ("/v1/script-doctor", {"script": "hi", "use_cache": "yes"}, "'use_cache' must be true or false"),
+    ("/v1/viral", {"topic": "coffee", "platforms": "YouTube"}, "'platforms' must be a non-empty list of strings"),
+    ("/v1/video-prompts", {"script": "Hi.", "max_workers": 0}, "'max_workers' must be between 1 and 16"),
+    ("/v1/video-prompts", {"script": "Hi.", "mode": "fast"}, "'mode' must be one of"),
+    ("/v1/video-prompts", {"script": "Hi.", "character": ["a man"]}, "'character' must be a string"),
+    ("/v1/images", {"prompt": "a cat", "number_of_images": True}, "'number_of_images' must be an integer"),
+])
+def test_bad_fields(post, path, body, message):
+    status, response = post(path, body)
+    assert status == 400
+    assert response["error"]["message"].startswith(message)
+
+def test_unexpected_errors_return_json(post, monkeypatch):
+    def boom(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(Studio, "script_doctor", boom)
+    status, body = post("/v1/script-doctor", {"script": "hello"})
+    assert status == 500
+    assert body["error"]["kind"] == "internal"
+
+def test_rejected_requests_do_not_poison_keep_alive(post):
+    connection = http.client.HTTPConnection("127.0.0.1", post.port, timeout=10)
+    body = json.dumps({"script": "hello"})
+    for path, headers, status in [
+        ("/v1/script-doctor", {}, 401),
+        ("/v1/nope", {"X-Api-Key": "AIzaTEST"}, 404),
+        ("/v1/script-doctor", {"X-Api-Key": "AIzaTEST"}, 200),
+    ]:
+        connection.request("POST", path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        assert response.status == status
+    connection.close()
+
+@pytest.mark.parametrize("length", ["-1", "abc", str(100 * 1024 * 1024)])
+def test_bad_content_length(post, length):
+    with socket.create_connection(("127.0.0.1", post.port), timeout=5) as sock:
+        sock.sendall(f"POST /v1/script-doctor HTTP/1.1\r\nHost: x\r\nX-Api-Key: AIzaTEST\r\n"
+                     f"Content-Length: {length}\r\n\r\n".encode())
+        reply = sock.makefile("rb").read()  # the server closes the connection
+    assert reply.startswith(b"HTTP/1.1 400")
+    assert b"Content-Length must be" in reply
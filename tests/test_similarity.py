@@ -0,0 +1,89 @@
+import random
+import sqlite3
+
+import pytest
+
+from fake_backend import FakeBackend
+from studio import ClientRegistry, Studio
+from studio.cache import ResponseCache
+from studio.similarity import SimilarityIndex, minhash, shingles
+
+def script(seed, words=400):
+    rng = random.Random(seed)
+    return " ".join("".join(rng.choice("abcdefghij") for _ in range(6)) for _ in range(words))
+
+def edited(text, fraction, seed=1):
+    words = text.split()
+    for i in random.Random(seed).sample(range(len(words)), int(fraction * len(words))):
+        words[i] = "zzzzzz"
+    return " ".join(words)
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(tmp_path / "responses.db", index=SimilarityIndex(tmp_path / "similarity.db"))
+
+def test_signature_estimates_jaccard():
+    text = script(0, 2000)
+    for fraction in (0.05, 0.2, 0.5):
+        other = edited(text, fraction)
+        a, b = set(shingles(text)), set(shingles(other))
+        estimate = sum(x == y for x, y in zip(minhash(text), minhash(other))) / 64
+        assert abs(estimate - len(a & b) / len(a | b)) < 0.15
+
+def test_signature_of_short_and_empty_text():
+    assert minhash("") is None
+    assert minhash("  \n ") is None
+    assert len(minhash("hi")) == 64
+    assert minhash("hi") == minhash(" HI ")
+
+def test_signature_is_computed_once_per_text(cache):
+    text = script(2)
+    minhash.cache_clear()
+    assert cache.get_similar("scope", text, 0.85) == (None, None)
+    cache.put("key", "value", "scope", text)
+    info = minhash.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+
+def test_near_duplicate_hit_and_miss(cache):
+    text = script(3)
+    cache.put("key", "value", "scope", text)
+    value, similarity = cache.get_similar("scope", edited(text, 0.02), 0.85)
+    assert value == "value" and similarity >= 0.85
+    assert cache.get_similar("scope", edited(text, 0.5), 0.85) == (None, None)
+    assert cache.get_similar("other scope", text, 0.85) == (None, None)
+    assert cache.near_hits == 1
+
+def test_expired_responses_are_not_reused(cache):
+    text = script(4)
+    cache.put("key", "value", "scope", text)
+    cache.ttl = 0
+    assert cache.get_similar("scope", text, 0.85) == (None, None)
+
+def test_index_from_another_signature_version_is_dropped(tmp_path):
+    path = tmp_path / "similarity.db"
+    db = sqlite3.connect(str(path))
+    db.execute("CREATE TABLE signatures (id INTEGER PRIMARY KEY, scope TEXT, ref TEXT, signature BLOB, created REAL)")
+    db.execute("INSERT INTO signatures (scope, ref, signature, created) VALUES ('scope', 'old', x'00', 0)")
+    db.commit()
+    db.close()
+    index = SimilarityIndex(path)
+    assert index._db.execute("SELECT COUNT(*) FROM signatures").fetchone()[0] == 0
+    index.add("scope", script(5), "new")
+    assert index.find("scope", script(5)) == [(1.0, "new")]
+
+def test_studio_reuse_is_scoped_per_key(tmp_path):
+    backend = FakeBackend()
+    studio = Studio(tmp_path, registry=ClientRegistry(client_factory=backend.client))
+    text = script(6)
+    first = studio.script_doctor("AIzaONE", text, stream=True, similarity=0.85)
+    first.consume()
+    again = studio.script_doctor("AIzaONE", edited(text, 0.02), stream=True, similarity=0.85)
+    again.consume()
+    assert again.similarity is not None
+    other = studio.script_doctor("AIzaTWO", edited(text, 0.02), stream=True, similarity=0.85)
+    other.consume()
+    assert other.similarity is None
+    # Headless callers only reuse near-duplicates when they ask for it
+    default = studio.script_doctor("AIzaONE", edited(text, 0.03), stream=True)
+    default.consume()
+    assert default.similarity is None